@@ -0,0 +1,116 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from foodgram_backend.cache import LocalTTLCache, is_shared_cache
+from foodgram_backend.metrics import observe_cache
+
+User = get_user_model()
+
+# Поля пользователя, которые хранятся в кеше. Остальные (в том числе
+# password) остаются отложенными и загружаются только при обращении.
+SNAPSHOT_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {
+        'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+        'is_active', 'is_staff', 'is_superuser',
+    }
+)
+
+local_token_cache = LocalTTLCache(maxsize=settings.TOKEN_CACHE_SIZE,
+                                  ttl=settings.TOKEN_CACHE_LOCAL_TTL)
+# Кеш Django в памяти процесса не виден другим воркерам: отозванный токен
+# оставался бы в нём на TOKEN_CACHE_TTL, поэтому второй уровень
+# используется только с общим кешем (Redis, Memcached, БД).
+shared_token_cache = is_shared_cache()
+
+
+def get_cache_key(key):
+    return f'auth-token:{sha256(key.encode()).hexdigest()}'
+
+
+def drop_cached_token(key):
+    cache_key = get_cache_key(key)
+    local_token_cache.delete(cache_key)
+    if shared_token_cache:
+        cache.delete(cache_key)
+
+
+def invalidate_token(key, using=DEFAULT_DB_ALIAS):
+    """
+    Удаляет снимок пользователя токена key из кешей сразу и ещё раз после
+    коммита, чтобы в кеш не вернулся снимок, прочитанный до него.
+
+    Общий кеш видят все воркеры, а в кеше процесса других воркеров снимок
+    живёт не дольше TOKEN_CACHE_LOCAL_TTL секунд.
+    """
+    drop_cached_token(key)
+    transaction.on_commit(lambda: drop_cached_token(key), using=using)
+
+
+def invalidate_user_tokens(user_id, using=DEFAULT_DB_ALIAS):
+    for key in Token.objects.using(using).filter(
+            user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key, using)
+
+
+def authenticate_request(request):
+    """
+    Аутентифицирует обычный HttpRequest классами из
+    DEFAULT_AUTHENTICATION_CLASSES для кода вне представлений DRF.
+    Возвращает пользователя или None, при неверных данных поднимает
+    AuthenticationFailed.
+    """
+    drf_request = Request(request)
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authenticator().authenticate(drf_request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену, которая хранит снимок пользователя сначала
+    в LRU-кеше процесса, затем в общем кеше Django (если он общий для
+    воркеров) и обращается к базе только при промахе в обоих.
+    """
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        values = local_token_cache.get(cache_key)
+        observe_cache('auth_token', values is not None)
+        if values is None:
+            values = self.get_shared(cache_key)
+            if values is None:
+                values = Token.objects.filter(key=key).values_list(
+                    *(f'user__{field}' for field in SNAPSHOT_FIELDS)
+                ).first()
+                if values is None:
+                    raise AuthenticationFailed(_('Invalid token.'))
+                self.set_shared(cache_key, values)
+            local_token_cache.set(cache_key, values)
+
+        user = User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, values)
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
+
+    @staticmethod
+    def get_shared(cache_key):
+        if not shared_token_cache:
+            return None
+        return cache.get(cache_key)
+
+    @staticmethod
+    def set_shared(cache_key, values):
+        if shared_token_cache:
+            cache.set(cache_key, values, settings.TOKEN_CACHE_TTL)
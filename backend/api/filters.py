@@ -1,8 +1,15 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import (
-    BooleanFilter, CharFilter, FilterSet, ModelMultipleChoiceFilter,
+    BooleanFilter, CharFilter, ChoiceFilter, FilterSet,
+    ModelMultipleChoiceFilter,
 )
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+INGREDIENTS_MATCH_CHOICES = (
+    ('all', 'Все ингредиенты'),
+    ('any', 'Любой из ингредиентов'),
+)
 
 
 class IngredientFilter(FilterSet):
@@ -15,26 +22,100 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    """Класс, реализующий фильтрацию при получении объектов рецепта."""
+    """
+    Класс, реализующий фильтрацию при получении объектов рецепта.
+
+    Все фильтры по связанным таблицам строятся на подзапросах EXISTS,
+    поэтому рецепт не дублируется в выдаче и DISTINCT не требуется.
+    """
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
         label='Теги',
     )
+    ingredients = ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_ingredients',
+        label='Ингредиенты',
+    )
+    ingredients_match = ChoiceFilter(
+        choices=INGREDIENTS_MATCH_CHOICES,
+        method='filter_ingredients_match',
+        label='Совпадение ингредиентов',
+    )
+    exclude_ingredients = ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_exclude_ingredients',
+        label='Без ингредиентов',
+    )
     is_favorited = BooleanFilter(method='filter_is_favorited',
                                  label='Избранные')
     is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart',
                                         label='В списке покупок')
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag__in=value
+                )
+            )
+        )
+
+    @staticmethod
+    def with_ingredients(ingredients):
+        return RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk'), ingredient__in=ingredients
+        )
+
+    def filter_ingredients(self, queryset, name, value):
+        """
+        По умолчанию в рецепте должны быть все ингредиенты (EXISTS
+        на каждый), с ingredients_match=any - хотя бы один.
+        """
+        if not value:
+            return queryset
+        if self.form.cleaned_data.get('ingredients_match') == 'any':
+            return queryset.filter(Exists(self.with_ingredients(value)))
+        for ingredient in value:
+            queryset = queryset.filter(
+                Exists(self.with_ingredients([ingredient]))
+            )
+        return queryset
+
+    def filter_ingredients_match(self, queryset, name, value):
+        # Учитывается в filter_ingredients.
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(~Exists(self.with_ingredients(value)))
+
+    def filter_by_annotation(self, queryset, annotation):
+        """
+        Фильтрует по уже добавленному подзапросу EXISTS из
+        favorite_and_shopping_cart_annotate, не создавая новых JOIN.
+        """
+        if annotation not in queryset.query.annotations:
+            queryset = queryset.favorite_and_shopping_cart_annotate(
+                user=self.request.user
+            )
+        return queryset.filter(**{annotation: True})
+
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorites__user=self.request.user)
+            return self.filter_by_annotation(queryset, 'is_favorited')
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return self.filter_by_annotation(queryset, 'is_in_shopping_cart')
         return queryset
 
     class Meta:
@@ -42,6 +123,9 @@ class RecipeFilter(FilterSet):
         fields = (
             'author',
             'tags',
+            'ingredients',
+            'ingredients_match',
+            'exclude_ingredients',
             'is_favorited',
             'is_in_shopping_cart'
         )
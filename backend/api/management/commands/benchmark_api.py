@@ -0,0 +1,196 @@
+import json
+import time
+from math import ceil
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram_backend.instrumentation import (QueryStats, current_stats,
+                                              enable_query_tracking)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий замер производительности основных эндпоинтов
+    внутри процесса через тестовый клиент DRF.
+    """
+    help = ('Замеряет пропускную способность, задержки p50/p95/p99 и число '
+            'SQL-запросов эндпоинтов и сравнивает их с сохранённым '
+            'эталоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--baseline',
+                            default='data/benchmark_baseline.json')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Сохранить результаты как новый эталон.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p95 относительно эталона.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        scenarios = self.get_scenarios()
+        results = {}
+        for name, (client, url, status) in scenarios.items():
+            results[name] = self.run_scenario(
+                client, url, status, options['iterations'], options['warmup']
+            )
+            self.print_result(name, results[name])
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(results, indent=2))
+            self.stdout.write(f'Эталон сохранён в {baseline_path}.')
+            return
+        if baseline_path.exists():
+            self.compare(results, json.loads(baseline_path.read_text()),
+                         options['tolerance'])
+
+    def get_scenarios(self):
+        """
+        Возвращает сценарии вида {имя: (клиент, url, ожидаемый статус)}
+        для данных, уже загруженных в базу (см. generate_dataset).
+        """
+        follower = (User.objects.annotate(count=Count('follows'))
+                    .order_by('-count').first())
+        shopper = (User.objects.annotate(count=Count('shopping_cart'))
+                   .order_by('-count').first())
+        author = (User.objects.annotate(count=Count('recipes'))
+                  .order_by('-count').first())
+        recipe = Recipe.objects.order_by('pk').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = Ingredient.objects.order_by('pk').first()
+        popular = list(RecipeIngredient.objects.values('ingredient').annotate(
+            count=Count('id')
+        ).order_by('-count').values_list('ingredient', flat=True)[:3])
+        if not all((follower, shopper, author, recipe, tags, ingredient,
+                    len(popular) == 3)):
+            raise CommandError('Недостаточно данных, выполните '
+                               'generate_dataset.')
+
+        anonymous = APIClient()
+        follower_client = APIClient()
+        follower_client.force_authenticate(follower)
+        # Скачивание списка покупок - обычное (не DRF) представление,
+        # поэтому клиент авторизуется настоящим токеном.
+        shopper_client = APIClient()
+        shopper_client.credentials(HTTP_AUTHORIZATION='Token ' + (
+            Token.objects.get_or_create(user=shopper)[0].key))
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        ingredient_query = (
+            f'ingredients={popular[0]}&ingredients={popular[1]}'
+            f'&exclude_ingredients={popular[2]}'
+        )
+        return {
+            'recipes.list': (anonymous, '/api/recipes/', 200),
+            'recipes.list.tags': (
+                anonymous, f'/api/recipes/?{tag_query}', 200),
+            'recipes.list.author': (
+                anonymous, f'/api/recipes/?author={author.id}', 200),
+            'recipes.list.ingredients': (
+                anonymous, f'/api/recipes/?{ingredient_query}', 200),
+            'recipes.list.ingredients.any': (
+                anonymous,
+                f'/api/recipes/?{ingredient_query}&ingredients_match=any',
+                200,
+            ),
+            'recipes.list.ingredients.tags.author': (
+                anonymous,
+                f'/api/recipes/?{ingredient_query}&ingredients_match=any'
+                f'&{tag_query}&author={author.id}',
+                200,
+            ),
+            'recipes.list.ingredients.page': (
+                anonymous,
+                f'/api/recipes/?exclude_ingredients={popular[0]}&page=20',
+                200,
+            ),
+            'recipes.list.favorited': (
+                shopper_client, '/api/recipes/?is_favorited=1', 200),
+            'recipes.detail': (
+                follower_client, f'/api/recipes/{recipe.id}/', 200),
+            'users.subscriptions': (
+                follower_client, '/api/users/subscriptions/', 200),
+            'recipes.download_shopping_cart': (
+                shopper_client, '/api/recipes/download_shopping_cart/', 200),
+            'ingredients.search': (
+                anonymous,
+                f'/api/ingredients/?name={ingredient.name[:2]}',
+                200,
+            ),
+            'short_url.redirect': (anonymous, f'/s/{recipe.short_url}/', 302),
+        }
+
+    @staticmethod
+    def run_scenario(client, url, status, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        latencies = []
+        # Запросы асинхронных представлений выполняются в потоках run_db,
+        # поэтому считаются через статистику контекста, а не по соединению.
+        enable_query_tracking()
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        try:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                start = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != status:
+                    raise CommandError(
+                        f'{url}: статус {response.status_code} '
+                        f'вместо {status}.'
+                    )
+            elapsed = time.perf_counter() - started
+        finally:
+            current_stats.reset(token)
+        return {
+            'rps': round(iterations / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'queries': stats.count // iterations,
+        }
+
+    def print_result(self, name, result):
+        self.stdout.write(
+            f'{name:<34} {result["rps"]:>8} rps  '
+            f'p50 {result["p50_ms"]:>8} мс  p95 {result["p95_ms"]:>8} мс  '
+            f'p99 {result["p99_ms"]:>8} мс  {result["queries"]:>4} SQL'
+        )
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p95 {result["p95_ms"]} мс, '
+                    f'эталон {expected["p95_ms"]} мс'
+                )
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: {result["queries"]} SQL-запросов, '
+                    f'эталон {expected["queries"]}'
+                )
+        if regressions:
+            raise CommandError('Регрессия производительности:\n'
+                               + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management import BaseCommand
+from django.test.utils import setup_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий сравнение скорости JSON-рендереров на странице
+    списка рецептов.
+    """
+    help = ('Замеряет скорость рендеринга RecipeViewSet.list в байтах '
+            'в секунду для стандартного и быстрого JSON-рендереров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        data = APIClient().get(
+            f'/api/recipes/?limit={options["limit"]}'
+        ).data
+        results = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                content = renderer.render(data)
+            elapsed = time.perf_counter() - started
+            results[type(renderer).__name__] = (
+                len(content) * options['iterations'] / elapsed
+            )
+            self.stdout.write(
+                f'{type(renderer).__name__:<20} {len(content):>10} байт  '
+                f'{results[type(renderer).__name__] / 2 ** 20:>10.1f} МБ/с'
+            )
+        self.stdout.write(
+            f'Ускорение: '
+            f'{results["FastJSONRenderer"] / results["JSONRenderer"]:.1f}x'
+        )
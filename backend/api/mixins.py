@@ -0,0 +1,34 @@
+from rest_framework.exceptions import ValidationError
+
+
+def get_sparse_fields(request, available):
+    """
+    Возвращает поля из available, выбранные параметрами запроса
+    fields=a,b и omit=c, в исходном порядке.
+    """
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    requested = set(fields.split(',')) if fields else set(available)
+    omitted = set(omit.split(',')) if omit else set()
+    unknown = (requested | omitted) - set(available)
+    if unknown:
+        raise ValidationError(
+            {'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}.'}
+        )
+    return tuple(
+        field for field in available
+        if field in requested and field not in omitted
+    )
+
+
+class SparseFieldsMixin:
+    """
+    Позволяет передать сериализатору аргумент fields и оставить
+    в ответе только перечисленные поля.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
@@ -1,9 +1,15 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
 from django.db.transaction import atomic
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
 from api.fields import Base64ImageField
+from api.mixins import SparseFieldsMixin
+from recipes.constants import (PANTRY_MAX_INGREDIENTS, PANTRY_MAX_MISSING,
+                               POPULARITY_DEFAULT_DAYS, POPULARITY_MAX_LIMIT)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.models import Follow
@@ -11,7 +17,7 @@ from users.models import Follow
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для чтения списка/объекта пользователя."""
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -194,6 +200,46 @@ class RecipeMiniReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class PantrySearchSerializer(serializers.Serializer):
+    """Сериализатор параметров поиска рецептов по имеющимся продуктам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=PANTRY_MAX_INGREDIENTS,
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, max_value=PANTRY_MAX_MISSING, default=0
+    )
+
+
+class PopularitySerializer(serializers.Serializer):
+    """
+    Сериализатор параметров выборки самых популярных ингредиентов
+    или тегов за период (по умолчанию - за последние дни).
+    """
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    order_by = serializers.ChoiceField(
+        choices=('recipes', 'favorites', 'shopping_carts'),
+        default='favorites'
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=POPULARITY_MAX_LIMIT, default=10
+    )
+
+    def validate(self, data):
+        data.setdefault('date_to', timezone.localdate())
+        data.setdefault(
+            'date_from',
+            data['date_to'] - timedelta(days=POPULARITY_DEFAULT_DAYS - 1)
+        )
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError(
+                {'date_from': 'Начало периода позже его конца.'}
+            )
+        return data
+
+
 class FavoriteAndShoppingCartSerializer(serializers.ModelSerializer):
     """
     Базовый класс для наследования сериализаторами избранного и списка покупок.
@@ -299,4 +345,6 @@ class SubscriptionSerializer(UserSerializer):
         ).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token, invalidate_user_tokens
+
+User = get_user_model()
+
+# Поля, изменение которых отзывает токены пользователя.
+REVOKING_FIELDS = ('password', 'is_active')
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, using, **kwargs):
+    """Выход через token/logout и удаление пользователя."""
+    invalidate_token(instance.key, using)
+
+
+@receiver(pre_save, sender=User)
+def check_revoking_fields(sender, instance, update_fields, using, **kwargs):
+    """
+    Сравнивает пароль и is_active с сохранёнными в БД. Сохранения без
+    этих полей (например, last_login при входе) БД не читают.
+    """
+    instance._revokes_tokens = False
+    if instance._state.adding:
+        return
+    deferred = instance.get_deferred_fields()
+    fields = [
+        field for field in REVOKING_FIELDS
+        if field not in deferred
+        and (update_fields is None or field in update_fields)
+    ]
+    if not fields:
+        return
+    saved = sender.objects.using(using).filter(pk=instance.pk).values(
+        *fields
+    ).first()
+    instance._revokes_tokens = saved is not None and any(
+        saved[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_revoked_user_tokens(sender, instance, using, **kwargs):
+    """Смена пароля и деактивация пользователя."""
+    if getattr(instance, '_revokes_tokens', False):
+        invalidate_user_tokens(instance.pk, using)
@@ -0,0 +1,12 @@
+"""Маршруты с асинхронными представлениями, как при ASGI=True."""
+from django.urls import path
+
+from api.views import IngredientSearchView, ShoppingCartDownloadView
+from recipes.views import ShortUrlRedirectView
+
+urlpatterns = [
+    path('api/recipes/download_shopping_cart/',
+         ShoppingCartDownloadView.as_async_view()),
+    path('api/ingredients/', IngredientSearchView.as_async_view()),
+    path('s/<slug:short_url>/', ShortUrlRedirectView.as_async_view()),
+]
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password-for-tests',
+        first_name=username.capitalize(),
+        last_name='Тестов',
+        **extra,
+    )
+
+
+def create_recipe(author, name, tags=(), ingredients=(), **extra):
+    """Рецепт с тегами tags и ингредиентами ingredients (по 10 ед.)."""
+    extra.setdefault('image', 'recipes/images/test.png')
+    recipe = Recipe.objects.create(author=author, name=name, text=name,
+                                   cooking_time=10, **extra)
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def create_tags(*slugs):
+    return [Tag.objects.create(name=slug.capitalize(), slug=slug)
+            for slug in slugs]
+
+
+def create_ingredients(*names):
+    return [Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in names]
+
+
+def token_client(user):
+    """Клиент API с токеном пользователя user."""
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
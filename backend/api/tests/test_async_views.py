@@ -0,0 +1,71 @@
+import asyncio
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import (AsyncClient, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+
+from api import views
+from api.tests.fixtures import create_ingredients
+from api.views import IngredientSearchView
+
+SEARCH_URL = '/api/ingredients/?name=Со'
+REQUESTS = 4
+DELAY = 0.5
+
+
+class AsViewTests(SimpleTestCase):
+    def test_wsgi_view_is_sync(self):
+        self.assertFalse(
+            asyncio.iscoroutinefunction(IngredientSearchView.as_view())
+        )
+
+    @override_settings(ASGI=True)
+    def test_asgi_view_is_async(self):
+        self.assertTrue(
+            asyncio.iscoroutinefunction(IngredientSearchView.as_view())
+        )
+
+
+@override_settings(
+    ROOT_URLCONF='api.tests.async_urls',
+    SQL_INSTRUMENTATION=True,
+    METRICS_ENABLED=True,
+    PROFILING_ENABLED=True,
+    REQUEST_BUDGETS={
+        'IngredientSearchView': {'timeout_ms': 5000, 'max_in_flight': 8},
+    },
+)
+class AsyncConcurrencyTests(TransactionTestCase):
+    """
+    Под ASGI запросы к асинхронным представлениям проходят через
+    промежуточные слои проекта, не выстраиваясь в очередь.
+    """
+    def setUp(self):
+        create_ingredients('Соль', 'Сода', 'Мука')
+
+    def fetch_all(self):
+        async def fetch():
+            client = AsyncClient()
+            return await asyncio.gather(
+                *(client.get(SEARCH_URL) for _ in range(REQUESTS))
+            )
+        return async_to_sync(fetch)()
+
+    def test_requests_run_concurrently(self):
+        json_response = views.json_response
+
+        def slow_json_response(*args, **kwargs):
+            time.sleep(DELAY)
+            return json_response(*args, **kwargs)
+
+        with mock.patch('api.views.json_response', slow_json_response):
+            start = time.perf_counter()
+            responses = self.fetch_all()
+            elapsed = time.perf_counter() - start
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 2)
+            self.assertIn('Server-Timing', response)
+        self.assertLess(elapsed, DELAY * REQUESTS / 2)
@@ -0,0 +1,128 @@
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.authentication import get_cache_key, local_token_cache
+from api.tests.fixtures import create_user, token_client
+
+ME_URL = '/api/users/me/'
+LOGOUT_URL = '/api/auth/token/logout/'
+SET_PASSWORD_URL = '/api/users/set_password/'
+
+
+class TokenRevocationTests(TestCase):
+    """
+    Отзыв токена удаляет из кешей только его снимок. Кеш процесса другого
+    воркера эмулируется снимком, который возвращается в кеш после отзыва.
+    """
+    def setUp(self):
+        local_token_cache.clear()
+        cache.clear()
+        self.user = create_user('reader')
+        self.client = token_client(self.user)
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        self.cache_key = get_cache_key(self.user.auth_token.key)
+        self.snapshot = local_token_cache.get(self.cache_key)
+        self.assertIsNotNone(self.snapshot)
+
+    def test_logout(self):
+        other = create_user('other')
+        other_client = token_client(other)
+        other_client.get(ME_URL)
+        other_key = get_cache_key(other.auth_token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(LOGOUT_URL).status_code, 204)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+        self.assertIsNotNone(local_token_cache.get(other_key))
+
+    def test_other_worker_keeps_snapshot_for_local_ttl(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(LOGOUT_URL)
+        local_token_cache.set(self.cache_key, self.snapshot)
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        expired = time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL + 1
+        with mock.patch('foodgram_backend.cache.time.monotonic',
+                        return_value=expired):
+            self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    @mock.patch('api.authentication.shared_token_cache', True)
+    def test_shared_cache_entry_deleted_after_commit(self):
+        local_token_cache.clear()
+        self.client.get(ME_URL)
+        self.assertIsNotNone(cache.get(self.cache_key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(LOGOUT_URL)
+            # Другой воркер успел прочитать токен до коммита.
+            cache.set(self.cache_key, self.snapshot)
+        self.assertIsNone(cache.get(self.cache_key))
+        local_token_cache.clear()
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_shared_cache_skipped_for_local_memory_backend(self):
+        self.assertIsNone(cache.get(self.cache_key))
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertIsNone(local_token_cache.get(self.cache_key))
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_login_does_not_read_or_invalidate_tokens(self):
+        with self.assertNumQueries(1):
+            update_last_login(None, self.user)
+        self.assertEqual(local_token_cache.get(self.cache_key),
+                         self.snapshot)
+
+    def test_unchanged_password_keeps_tokens(self):
+        self.user.last_name = 'Другой'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(local_token_cache.get(self.cache_key),
+                         self.snapshot)
+
+    def test_profile_update_refreshes_snapshot(self):
+        response = self.client.patch(ME_URL, {'first_name': 'Новое'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(ME_URL).json()['first_name'],
+                         'Новое')
+
+
+class SharedCachePasswordChangeTests(TestCase):
+    """Смена пароля с общим для воркеров кешем (файловый кеш Django)."""
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches_override = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+        }})
+        caches_override.enable()
+        self.addCleanup(caches_override.disable)
+        shared = mock.patch('api.authentication.shared_token_cache', True)
+        shared.start()
+        self.addCleanup(shared.stop)
+        local_token_cache.clear()
+        self.user = create_user('reader')
+        self.client = token_client(self.user)
+
+    def test_old_token_rejected_after_set_password(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        cache_key = get_cache_key(self.user.auth_token.key)
+        self.assertIsNotNone(cache.get(cache_key))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(SET_PASSWORD_URL, {
+                'current_password': 'password-for-tests',
+                'new_password': 'another-password-42',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(cache.get(cache_key))
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+        # Другой воркер: кеш процесса пуст, общий кеш тот же.
+        local_token_cache.clear()
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
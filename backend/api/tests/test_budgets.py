@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from foodgram_backend.deadlines import (InFlight, check_deadline,
+                                        request_deadline, watch_deadlines)
+from foodgram_backend.middleware import RequestBudgetMiddleware
+
+BUDGETS = {
+    'RecipeViewSet.list': {'timeout_ms': 3000, 'max_in_flight': 16,
+                           'stale_ttl': 600},
+}
+
+
+class FakeConnection(SimpleNamespace):
+    """Соединение Postgres, записывающее выполненные SET."""
+    @contextmanager
+    def cursor(self):
+        yield SimpleNamespace(
+            execute=lambda sql, params=None: self.executed.append(
+                (sql, params)
+            )
+        )
+
+
+class DeadlineTests(SimpleTestCase):
+    def run_query(self, connection, now):
+        with mock.patch('foodgram_backend.deadlines.time.monotonic',
+                        return_value=now):
+            check_deadline(lambda *args: None, 'SELECT 1', None, False,
+                           {'connection': connection})
+
+    def test_statement_timeout_follows_remaining_time(self):
+        connection = FakeConnection(vendor='postgresql', executed=[],
+                                    statement_timeout=None)
+        token = request_deadline.set(10.0)
+        try:
+            self.run_query(connection, 9.0)
+            self.run_query(connection, 9.05)
+            self.run_query(connection, 9.75)
+        finally:
+            request_deadline.reset(token)
+        self.run_query(connection, 11.0)
+        self.assertEqual(connection.executed, [
+            ('SET statement_timeout = %s', [1000]),
+            ('SET statement_timeout = %s', [900]),
+            ('SET statement_timeout = %s', [200]),
+            ('SET statement_timeout = DEFAULT', None),
+        ])
+
+    @override_settings(REQUEST_BUDGETS={})
+    def test_connections_not_wrapped_without_budgets(self):
+        connection = SimpleNamespace(vendor='sqlite', execute_wrappers=[],
+                                     connection=mock.Mock())
+        watch_deadlines(None, connection)
+        self.assertEqual(connection.execute_wrappers, [])
+        connection.connection.set_progress_handler.assert_not_called()
+
+
+class InFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_limit_is_shared_through_cache(self):
+        worker, other_worker = InFlight(60), InFlight(60)
+        self.assertTrue(worker.acquire('view', 2))
+        self.assertTrue(other_worker.acquire('view', 2))
+        self.assertFalse(worker.acquire('view', 2))
+        other_worker.release('view')
+        self.assertTrue(worker.acquire('view', 2))
+
+    def test_acquire_refreshes_ttl(self):
+        worker = InFlight(60)
+        with mock.patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            worker.acquire('view', 2)
+            worker.acquire('view', 2)
+        self.assertEqual(touch.call_count, 2)
+        touch.assert_called_with(worker.get_key('view'), 60)
+
+    def test_release_without_record(self):
+        worker = InFlight(60)
+        worker.release('view')
+        self.assertIsNone(cache.get(worker.get_key('view')))
+
+    def test_release_after_expiry_does_not_go_negative(self):
+        worker = InFlight(60)
+        worker.acquire('view', 1)
+        cache.delete(worker.get_key('view'))
+        worker.acquire('view', 1)
+        worker.release('view')
+        worker.release('view')
+        self.assertEqual(cache.get(worker.get_key('view')), 0)
+        self.assertTrue(worker.acquire('view', 1))
+        self.assertFalse(worker.acquire('view', 1))
+
+    @override_settings(SERVER_WORKERS=4, REQUEST_BUDGETS=BUDGETS)
+    def test_process_cache_with_several_workers_skips_limit(self):
+        with self.assertLogs('foodgram.performance', 'WARNING'):
+            middleware = RequestBudgetMiddleware(lambda request: None)
+        self.assertFalse(middleware.limit_in_flight)
+
+    @override_settings(SERVER_WORKERS=1, REQUEST_BUDGETS=BUDGETS)
+    def test_process_cache_with_one_worker_keeps_limit(self):
+        self.assertTrue(
+            RequestBudgetMiddleware(lambda request: None).limit_in_flight
+        )
+
+
+@override_settings(REQUEST_BUDGETS=BUDGETS)
+class StaleResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_response_written_once_per_refresh(self):
+        with mock.patch('foodgram_backend.middleware.cache',
+                        wraps=cache) as mocked:
+            for _ in range(3):
+                self.assertEqual(
+                    self.client.get('/api/recipes/').status_code, 200
+                )
+            self.client.get('/api/tags/')
+        stale_keys = [call.args[0] for call in mocked.set.call_args_list]
+        self.assertEqual(len(stale_keys), 1)
+        self.assertTrue(stale_keys[0].startswith('stale-response:'))
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (create_recipe, create_tags, create_user,
+                                token_client)
+from recipes.models import Favorite, ShoppingCart
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeFilterTests(TestCase):
+    """Фильтры списка рецептов по тегам, избранному и списку покупок."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.breakfast, cls.lunch, cls.dinner = create_tags(
+            'breakfast', 'lunch', 'dinner'
+        )
+        cls.both = create_recipe(cls.author, 'Оба тега',
+                                 tags=(cls.breakfast, cls.lunch))
+        cls.one = create_recipe(cls.author, 'Один тег',
+                                tags=(cls.breakfast,))
+        cls.other = create_recipe(cls.author, 'Другой тег',
+                                  tags=(cls.dinner,))
+        Favorite.objects.create(user=cls.reader, recipe=cls.both)
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.one)
+
+    def get_ids(self, client, query):
+        response = client.get(RECIPES_URL, {'limit': 100, **query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_several_tags_do_not_duplicate_recipes(self):
+        ids = self.get_ids(APIClient(),
+                           {'tags': ['breakfast', 'lunch', 'dinner']})
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertCountEqual(ids, [self.both.id, self.one.id, self.other.id])
+        response = APIClient().get(
+            RECIPES_URL, {'tags': ['breakfast', 'lunch']}
+        )
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_favorite_and_cart_filters_for_authenticated_user(self):
+        client = token_client(self.reader)
+        self.assertEqual(self.get_ids(client, {'is_favorited': 1}),
+                         [self.both.id])
+        self.assertEqual(self.get_ids(client, {'is_in_shopping_cart': 1}),
+                         [self.one.id])
+        self.assertEqual(
+            self.get_ids(client, {'is_favorited': 1,
+                                  'is_in_shopping_cart': 1}),
+            [],
+        )
+        self.assertEqual(len(self.get_ids(client, {'is_favorited': 0})), 3)
+
+    def test_favorite_and_cart_filters_ignored_for_anonymous(self):
+        for name in ('is_favorited', 'is_in_shopping_cart'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    len(self.get_ids(APIClient(), {name: 1})), 3
+                )
+
+    def test_filters_use_exists_without_distinct(self):
+        client = token_client(self.reader)
+        client.get(RECIPES_URL)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(RECIPES_URL, {
+                'tags': ['breakfast', 'lunch'],
+                'is_favorited': 1,
+                'is_in_shopping_cart': 0,
+            })
+        self.assertEqual(response.status_code, 200)
+        recipe_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "recipes_recipe"' in query['sql']
+        ]
+        self.assertTrue(recipe_queries)
+        for sql in recipe_queries:
+            self.assertNotIn('DISTINCT', sql)
+            self.assertIn('EXISTS', sql)
+            self.assertNotIn('JOIN "recipes_recipe_tags"', sql)
+
+    def test_query_count_does_not_depend_on_tags(self):
+        client = token_client(self.reader)
+        client.get(RECIPES_URL)
+        with CaptureQueriesContext(connection) as context:
+            client.get(RECIPES_URL, {'tags': 'breakfast'})
+        with self.assertNumQueries(len(context.captured_queries)):
+            client.get(RECIPES_URL,
+                       {'tags': ['breakfast', 'lunch', 'dinner'],
+                        'is_favorited': 1})
@@ -0,0 +1,42 @@
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.tests.fixtures import (create_ingredients, create_recipe,
+                                create_user, token_client)
+from recipes.models import ShoppingCart
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+@override_settings(SQL_INSTRUMENTATION=True, SQL_QUERY_BUDGET=0)
+class AsyncViewQueryStatsTests(TransactionTestCase):
+    """Статистика SQL учитывает запросы из потоков run_db."""
+    def setUp(self):
+        self.user = create_user('buyer')
+        salt, flour = create_ingredients('Соль', 'Мука')
+        for name in ('Хлеб', 'Лепёшка'):
+            recipe = create_recipe(self.user, name,
+                                   ingredients=(salt, flour))
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+    @override_settings(ROOT_URLCONF='api.tests.async_urls')
+    def test_download_counts_queries_from_db_threads(self):
+        token = Token.objects.create(user=self.user)
+
+        async def download():
+            return await AsyncClient().get(
+                DOWNLOAD_URL, authorization=f'Token {token.key}'
+            )
+
+        with self.assertLogs('foodgram.performance', 'WARNING') as logs:
+            response = async_to_sync(download)()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ShoppingCartDownloadView', logs.output[0])
+        self.assertRegex(logs.output[0], r': [2-9]\d* запросов к БД')
+
+    def test_download_sums_amounts_in_database(self):
+        response = token_client(self.user).get(DOWNLOAD_URL)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content).decode(),
+                         'Мука: 20 г.\nСоль: 20 г.\n')
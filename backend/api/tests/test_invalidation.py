@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from api.tests.fixtures import create_ingredients, create_tags
+from foodgram_backend import invalidation
+
+
+class PublishTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(invalidation.bus.backend, 'publish')
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return sorted(call.args[0] for call in self.publish.call_args_list)
+
+    def test_once_per_namespace_per_transaction(self):
+        with transaction.atomic():
+            create_tags('breakfast', 'lunch', 'dinner')
+            create_ingredients('Соль', 'Мука')
+            self.assertEqual(self.published(), [])
+        self.assertEqual(self.published(),
+                         [invalidation.INGREDIENTS, invalidation.TAGS])
+
+    def test_rolled_back_transaction_does_not_block_publish(self):
+        with transaction.atomic():
+            create_tags('breakfast')
+            transaction.set_rollback(True)
+        with transaction.atomic():
+            create_tags('lunch')
+            with transaction.atomic():
+                create_tags('dinner')
+                transaction.set_rollback(True)
+        self.assertEqual(self.published(), [invalidation.TAGS])
+
+    def test_savepoint_rollback_keeps_outer_publish(self):
+        with transaction.atomic():
+            create_tags('breakfast')
+            try:
+                with transaction.atomic():
+                    create_tags('lunch')
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(self.published(), [invalidation.TAGS])
+
+    def test_autocommit_publishes_each_change(self):
+        create_tags('breakfast', 'lunch')
+        self.assertEqual(self.published(),
+                         [invalidation.TAGS, invalidation.TAGS])
+
+
+class TwoConsumersTests(TransactionTestCase):
+    """Два процесса с шиной на одной БД, как два воркера gunicorn."""
+    def create_consumer(self):
+        bus = invalidation.InvalidationBus(invalidation.DatabaseBackend(),
+                                           interval=60)
+        cached = {'tags': ['breakfast']}
+        bus.subscribe(invalidation.TAGS, cached.clear)
+        bus.poll(force=True)
+        return bus, cached
+
+    def test_second_consumer_cache_expires_after_first_writes(self):
+        first, first_cache = self.create_consumer()
+        second, second_cache = self.create_consumer()
+        second.poll(force=True)
+        self.assertTrue(second_cache)
+
+        with mock.patch.object(invalidation, 'bus', first):
+            with transaction.atomic():
+                create_tags('lunch', 'dinner')
+                first.poll(force=True)
+                second.poll(force=True)
+                self.assertTrue(second_cache)
+        self.assertFalse(first_cache)
+
+        second.poll()
+        self.assertTrue(second_cache, 'опрос не чаще interval секунд')
+        second.poll(force=True)
+        self.assertFalse(second_cache)
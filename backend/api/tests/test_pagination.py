@@ -0,0 +1,137 @@
+import json
+import tracemalloc
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import (create_ingredients, create_recipe,
+                                create_tags, create_user, token_client)
+from recipes.models import Recipe, RecipeIngredient
+
+RECIPES_URL = '/api/recipes/'
+STREAM_CHUNK = 50
+
+
+class RecipeListLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='Текст',
+                   cooking_time=10, image='recipes/images/test.png',
+                   short_url=f'limit{number}')
+            for number in range(settings.MAX_PAGE_SIZE + 1)
+        )
+
+    def test_large_limit_is_capped(self):
+        response = APIClient().get(RECIPES_URL, {'limit': 10 ** 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']),
+                         settings.MAX_PAGE_SIZE)
+
+
+class RecipeStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user('staff', is_staff=True)
+        tag, = create_tags('lunch')
+        ingredient, = create_ingredients('Соль')
+        cls.recipes = [
+            create_recipe(cls.staff, f'Рецепт {number}', tags=(tag,),
+                          ingredients=(ingredient,))
+            for number in range(5)
+        ]
+
+    def stream(self):
+        response = token_client(self.staff).get(RECIPES_URL, {'stream': 1})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_stream_forbidden_for_regular_users(self):
+        for client in (APIClient(), token_client(create_user('reader'))):
+            response = client.get(RECIPES_URL, {'stream': 1})
+            self.assertEqual(response.status_code, 403)
+            self.assertNotIsInstance(response, StreamingHttpResponse)
+
+    def test_stream_returns_every_recipe(self):
+        self.assertEqual(
+            sorted(recipe['id'] for recipe in self.stream()),
+            sorted(recipe.id for recipe in self.recipes),
+        )
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_stream_reads_in_chunks(self):
+        with mock.patch.object(QuerySet, 'iterator', autospec=True,
+                               side_effect=QuerySet.iterator) as iterator:
+            with CaptureQueriesContext(connection) as small_chunks:
+                self.assertEqual(len(self.stream()), 5)
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': 2})
+        with override_settings(STREAM_CHUNK_SIZE=100):
+            with CaptureQueriesContext(connection) as one_chunk:
+                self.stream()
+        # Теги, ингредиенты и авторы читаются заново для каждой пачки.
+        self.assertEqual(self.count_tag_queries(small_chunks), 3)
+        self.assertEqual(self.count_tag_queries(one_chunk), 1)
+
+    @staticmethod
+    def count_tag_queries(context):
+        return sum('recipes_recipe_tags' in query['sql']
+                   for query in context.captured_queries)
+
+
+@override_settings(STREAM_CHUNK_SIZE=STREAM_CHUNK)
+class RecipeStreamMemoryTests(TestCase):
+    """
+    Пик памяти выгрузки из 10 пачек почти не больше, чем из 2: в памяти
+    одновременно только одна пачка. При сборке всего списка сразу пик
+    растёт пропорционально числу рецептов.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user('staff', is_staff=True)
+        few, many = create_tags('few', 'many')
+        ingredients = create_ingredients('Соль', 'Мука', 'Молоко')
+        Recipe.objects.bulk_create(
+            Recipe(author=cls.staff, name=f'Рецепт {number}',
+                   text='Текст рецепта. ' * 20, cooking_time=10,
+                   image='recipes/images/test.png',
+                   short_url=f'stream{number}')
+            for number in range(10 * STREAM_CHUNK)
+        )
+        recipes = list(Recipe.objects.order_by('id'))
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.bulk_create(
+            [RecipeTag(recipe=recipe, tag=many) for recipe in recipes]
+            + [RecipeTag(recipe=recipe, tag=few)
+               for recipe in recipes[:2 * STREAM_CHUNK]]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in recipes
+            for ingredient in ingredients
+        )
+
+    def measure(self, tag):
+        """Возвращает пик памяти выгрузки рецептов с тегом и её размер."""
+        client = token_client(self.staff)
+        tracemalloc.start()
+        try:
+            response = client.get(RECIPES_URL, {'stream': 1, 'tags': tag})
+            size = sum(len(part) for part in response.streaming_content)
+            return tracemalloc.get_traced_memory()[1], size
+        finally:
+            tracemalloc.stop()
+
+    def test_peak_memory_does_not_grow_with_recipes(self):
+        # Первая выгрузка заполняет кэши модулей и запросов.
+        self.measure('few')
+        few_peak, few_size = self.measure('few')
+        many_peak, many_size = self.measure('many')
+        self.assertGreater(many_size, 4 * few_size)
+        self.assertLess(many_peak, 1.5 * few_peak)
@@ -0,0 +1,70 @@
+import os
+import pstats
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.tests.fixtures import (create_ingredients, create_recipe,
+                                create_user, token_client)
+from recipes.models import ShoppingCart
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/?profile'
+RECIPES_URL = '/api/recipes/?profile'
+
+
+class ProfileTests(TransactionTestCase):
+    """В профиль запроса попадает код представления из любого потока."""
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(PROFILING_ENABLED=True,
+                                              PROFILING_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = create_user('chef', is_staff=True)
+        salt, = create_ingredients('Соль')
+        recipe = create_recipe(self.user, 'Хлеб', ingredients=(salt,))
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+    def async_get(self, url):
+        token = Token.objects.get_or_create(user=self.user)[0]
+
+        async def get():
+            return await AsyncClient().get(
+                url, authorization=f'Token {token.key}'
+            )
+
+        return async_to_sync(get)()
+
+    def assertProfiled(self, response, function):
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(self.directory, response['X-Profile-Id'])
+        functions = pstats.Stats(f'{path}.prof').stats
+        self.assertIn(
+            function,
+            {(os.path.relpath(filename), name)
+             for filename, _, name in functions},
+        )
+        self.assertTrue(os.path.exists(f'{path}.collapsed'))
+
+    def test_sync_view(self):
+        response = token_client(self.user).get(DOWNLOAD_URL)
+        self.assertProfiled(response, ('api/views.py', 'get'))
+
+    @override_settings(ROOT_URLCONF='api.tests.async_urls')
+    def test_view_in_db_thread_pool(self):
+        response = self.async_get(DOWNLOAD_URL)
+        self.assertProfiled(response, ('api/views.py', 'get'))
+
+    def test_sync_view_under_asgi(self):
+        response = self.async_get(RECIPES_URL)
+        self.assertProfiled(response, ('api/views.py', 'get_queryset'))
+
+    def test_non_staff_is_not_profiled(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.async_get(RECIPES_URL)
+        self.assertNotIn('X-Profile-Id', response)
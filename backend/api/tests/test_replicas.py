@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.fixtures import (create_recipe, create_tags, create_user,
+                                token_client)
+from foodgram_backend import routers
+
+TAGS_URL = '/api/tags/'
+RECIPES_URL = '/api/recipes/'
+
+
+def add_database(alias, **overrides):
+    """Подключает псевдоним БД с настройками тестовой основной базы."""
+    connections.settings[alias] = {
+        **connections['default'].settings_dict, **overrides
+    }
+
+
+def remove_database(alias):
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Реплика - второй псевдоним той же тестовой базы, недоступная
+    реплика - файл SQLite в несуществующем каталоге. Псевдонимы
+    добавляются после setUpClass, поэтому тестовый раннер их не создаёт
+    и не очищает, а запросы к ним разрешены.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        add_database('replica', TEST={
+            **connections['default'].settings_dict['TEST'],
+            'MIRROR': 'default',
+        })
+        add_database('broken', NAME='/nonexistent/foodgram/replica.sqlite3')
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_database('replica')
+        remove_database('broken')
+        super().tearDownClass()
+
+    def setUp(self):
+        routers._unavailable.clear()
+        self.addCleanup(routers._unavailable.clear)
+        self.user = create_user('reader')
+        create_tags('breakfast', 'lunch')
+        self.recipe = create_recipe(self.user, 'Борщ')
+
+    def get(self, client, url, alias):
+        """Выполняет GET и возвращает SQL-запросы к базе alias."""
+        with CaptureQueriesContext(connections[alias]) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_safe_read_goes_to_replica(self):
+        with CaptureQueriesContext(connections['default']) as default:
+            replica = self.get(self.client, TAGS_URL, 'replica')
+        self.assertTrue(any('FROM "recipes_tag"' in sql for sql in replica))
+        self.assertFalse(any('FROM "recipes_tag"' in query['sql']
+                             for query in default.captured_queries))
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_write_makes_next_read_sticky(self):
+        client = token_client(self.user)
+        response = client.post(f'{RECIPES_URL}{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.get(client, RECIPES_URL, 'replica'), [])
+        default = self.get(client, RECIPES_URL, 'default')
+        self.assertTrue(any('FROM "recipes_recipe"' in sql
+                            for sql in default))
+
+    @override_settings(REPLICA_DATABASES=['broken'])
+    def test_unavailable_replica_falls_back_to_default(self):
+        with self.assertLogs('foodgram.replicas', 'WARNING'):
+            default = self.get(self.client, TAGS_URL, 'default')
+        self.assertTrue(any('FROM "recipes_tag"' in sql for sql in default))
+        self.assertIn('broken', routers._unavailable)
+        # Пока не истёк REPLICA_RETRY_SECONDS, реплика не проверяется.
+        with self.assertNoLogs('foodgram.replicas', 'WARNING'):
+            self.get(self.client, TAGS_URL, 'default')
@@ -0,0 +1,181 @@
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
+from rest_framework.routers import DefaultRouter
+from rest_framework.test import APIClient
+
+from api.renderers import FastJSONRenderer
+from api.tests.fixtures import (create_ingredients, create_recipe,
+                                create_tags, create_user, token_client)
+from api.views import RecipeViewSet
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Follow
+
+RECIPES_URL = '/api/recipes/'
+# Больше одной пачки потоковой выгрузки и несколько страниц по 100.
+RECIPES = settings.STREAM_CHUNK_SIZE + 20
+PAGE_LIMIT = 100
+
+
+class SerializerRecipeViewSet(RecipeViewSet):
+    """Чтение рецептов через RecipeReadSerializer, как до RecipeReader."""
+    def list(self, request, *args, **kwargs):
+        if 'stream' not in request.query_params:
+            return ListModelMixin.list(self, request, *args, **kwargs)
+        serializer = self.get_serializer(
+            self.filter_queryset(self.get_queryset()), many=True
+        )
+        return HttpResponse(FastJSONRenderer().render(serializer.data),
+                            content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        return RetrieveModelMixin.retrieve(self, request, *args, **kwargs)
+
+
+router = DefaultRouter()
+router.register('recipes', SerializerRecipeViewSet, basename='recipe')
+
+# Те же адреса, что и в проекте, но рецепты читает SerializerRecipeViewSet.
+urlpatterns = [
+    path('api/', include(router.urls)),
+    path('', include('foodgram_backend.urls')),
+]
+
+
+class RecipeReaderParityTests(TestCase):
+    """
+    RecipeReader отдаёт те же байты ответа, что и RecipeReadSerializer:
+    для страниц списка, отдельных рецептов и потоковой выгрузки.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader', is_staff=True)
+        cls.author = create_user('author', avatar='users/avatars/a.png')
+        cls.other_author = create_user('other')
+        Follow.objects.create(user=cls.reader, following=cls.author)
+        tags = create_tags('breakfast', 'lunch', 'dinner')
+        ingredients = create_ingredients('Соль', 'Мука', 'Сахар', 'Вода')
+        cls.favorited = create_recipe(cls.author, 'В избранном',
+                                      tags=tags[:2],
+                                      ingredients=ingredients[:2])
+        cls.in_cart = create_recipe(cls.other_author, 'В покупках',
+                                    tags=tags[1:2],
+                                    ingredients=ingredients[1:2])
+        cls.plain = create_recipe(cls.other_author, 'Без картинки',
+                                  image='')
+        Favorite.objects.create(user=cls.reader, recipe=cls.favorited)
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.in_cart)
+        cls.create_many_recipes(tags, ingredients)
+
+    @classmethod
+    def create_many_recipes(cls, tags, ingredients):
+        authors = (cls.author, cls.other_author)
+        Recipe.objects.bulk_create(
+            Recipe(author=authors[number % 2], name=f'Рецепт {number:04}',
+                   text=f'Текст {number}', cooking_time=number % 90 + 1,
+                   image=f'recipes/images/{number}.png',
+                   short_url=f'parity{number}')
+            for number in range(RECIPES)
+        )
+        recipes = list(Recipe.objects.filter(short_url__startswith='parity'))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for number, recipe in enumerate(recipes)
+            for tag in tags[:number % (len(tags) + 1)]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=number % 7 + 1)
+            for number, recipe in enumerate(recipes)
+            for ingredient in ingredients[number % 3:]
+        )
+        for model, step in ((Favorite, 3), (ShoppingCart, 5)):
+            model.objects.bulk_create(
+                model(user=cls.reader, recipe=recipe)
+                for recipe in recipes[::step]
+            )
+
+    def get_both(self, client, url, params=None):
+        """Ответы RecipeReader и RecipeReadSerializer на один запрос."""
+        reader = client.get(url, params)
+        with override_settings(ROOT_URLCONF=__name__):
+            serializer = client.get(url, params)
+        self.assertEqual(reader.status_code, 200)
+        self.assertEqual(serializer.status_code, 200)
+        self.assertIs(serializer.wsgi_request.resolver_match.func.cls,
+                      SerializerRecipeViewSet)
+        return reader, serializer
+
+    def assert_same_bytes(self, client, url, params=None):
+        reader, serializer = self.get_both(client, url, params)
+        self.assertEqual(reader.content, serializer.content)
+        return reader
+
+    def assert_list_parity(self, client):
+        pages = -(-Recipe.objects.count() // PAGE_LIMIT)
+        self.assertGreater(pages, 2)
+        for page in range(1, pages + 1):
+            with self.subTest(page=page):
+                self.assert_same_bytes(client, RECIPES_URL,
+                                       {'limit': PAGE_LIMIT, 'page': page})
+        self.assert_same_bytes(client, RECIPES_URL)
+
+    def assert_retrieve_parity(self, client):
+        recipes = [self.favorited, self.in_cart, self.plain,
+                   *Recipe.objects.filter(short_url__startswith='parity')[:9]]
+        for recipe in recipes:
+            with self.subTest(recipe=recipe.name):
+                self.assert_same_bytes(client, f'{RECIPES_URL}{recipe.id}/')
+
+    def test_authenticated_list(self):
+        client = token_client(self.reader)
+        self.assert_list_parity(client)
+        results = {
+            recipe['name']: recipe for recipe in client.get(
+                RECIPES_URL, {'limit': PAGE_LIMIT, 'page': 6}
+            ).json()['results']
+        }
+        favorited = results['В избранном']
+        self.assertTrue(favorited['is_favorited'])
+        self.assertTrue(favorited['author']['is_subscribed'])
+        self.assertIsNotNone(favorited['author']['avatar'])
+        self.assertTrue(results['В покупках']['is_in_shopping_cart'])
+        self.assertIsNone(results['В покупках']['author']['avatar'])
+        self.assertIsNone(results['Без картинки']['image'])
+
+    def test_authenticated_retrieve(self):
+        self.assert_retrieve_parity(token_client(self.reader))
+
+    def test_anonymous_list_and_retrieve(self):
+        client = APIClient()
+        self.assert_list_parity(client)
+        self.assert_retrieve_parity(client)
+
+    def test_stream_list(self):
+        client = token_client(self.reader)
+        reader, serializer = self.get_both(client, RECIPES_URL,
+                                           {'stream': ''})
+        self.assertTrue(reader.streaming)
+        content = b''.join(reader.streaming_content)
+        self.assertEqual(content, serializer.content)
+        recipes = json.loads(content)
+        self.assertEqual(len(recipes), Recipe.objects.count())
+        self.assertGreater(len(recipes), settings.STREAM_CHUNK_SIZE)
+        self.assertTrue(any(recipe['is_favorited'] for recipe in recipes))
+        self.assertTrue(any(recipe['is_in_shopping_cart']
+                            for recipe in recipes))
+
+    def test_subscriptions_read_without_joins(self):
+        client = token_client(self.reader)
+        with CaptureQueriesContext(connection) as context:
+            client.get(RECIPES_URL)
+        follow_queries = [query['sql'] for query in context.captured_queries
+                          if 'FROM "users_follow"' in query['sql']]
+        self.assertEqual(len(follow_queries), 1)
+        self.assertNotIn('JOIN', follow_queries[0])
@@ -0,0 +1,109 @@
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.fixtures import create_recipe, create_user
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+THREADS = 8
+RECIPES = 15
+
+
+@override_settings(SQLITE_TUNING=True)
+class ConcurrentSQLiteWritesTests(TransactionTestCase):
+    """
+    Несколько потоков одновременно пишут в избранное и корзину через API.
+    Потоки работают с временным файлом SQLite через движок
+    foodgram_backend.sqlite с настройками SQLITE_TUNING, как воркеры
+    gunicorn: тестовая база в памяти такой конкуренции не создаёт.
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Соединения создаются в каждом потоке заново по этим настройкам,
+        # соединение основного потока остаётся с тестовой базой.
+        default = connections.settings['default']
+        connections.settings['default'] = {
+            **default,
+            'ENGINE': 'foodgram_backend.sqlite',
+            'NAME': str(Path(directory.name) / 'db.sqlite3'),
+            'OPTIONS': {'timeout': settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        }
+        self.addCleanup(connections.settings.__setitem__, 'default', default)
+        self.run_in_thread(self.create_data)
+
+    @staticmethod
+    def run_in_thread(func, *args):
+        """Выполняет func в отдельном потоке со своим соединением."""
+        result = []
+
+        def target():
+            try:
+                result.append(func(*args))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        return result[0] if result else None
+
+    @staticmethod
+    def create_data():
+        call_command('migrate', verbosity=0)
+        author = create_user('author')
+        for number in range(THREADS):
+            create_user(f'user{number}')
+        for number in range(RECIPES):
+            create_recipe(author, f'Рецепт {number}')
+        assert connection.settings_dict['ENGINE'] == 'foodgram_backend.sqlite'
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            assert cursor.fetchone()[0] == 'wal'
+
+    @staticmethod
+    def write(username, barrier, errors):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username=username))
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        barrier.wait()
+        try:
+            for recipe_id in recipe_ids:
+                for action in ('favorite', 'shopping_cart'):
+                    response = client.post(
+                        f'/api/recipes/{recipe_id}/{action}/'
+                    )
+                    if response.status_code != 201:
+                        errors.append(f'{action}: {response.status_code}')
+        except Exception as error:
+            errors.append(repr(error))
+        finally:
+            connection.close()
+
+    @staticmethod
+    def count_rows():
+        return Favorite.objects.count(), ShoppingCart.objects.count()
+
+    def test_concurrent_writes(self):
+        barrier = threading.Barrier(THREADS)
+        errors = []
+        threads = [
+            threading.Thread(target=self.write,
+                             args=(f'user{number}', barrier, errors))
+            for number in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertFalse(any('locked' in error for error in errors))
+        self.assertEqual(self.run_in_thread(self.count_rows),
+                         (THREADS * RECIPES, THREADS * RECIPES))
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.views import (IngredientSearchView, IngredientViewSet, RecipeViewSet,
+                       ShoppingCartDownloadView, TagViewSet, UserViewSet)
 
 
 router = DefaultRouter()
@@ -10,6 +11,9 @@ router.register('ingredients', IngredientViewSet, basename='ingredient')
 router.register('recipes', RecipeViewSet, basename='recipe')
 
 urlpatterns = [
+    path('recipes/download_shopping_cart/',
+         ShoppingCartDownloadView.as_view()),
+    path('ingredients/', IngredientSearchView.as_view()),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
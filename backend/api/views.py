@@ -1,40 +1,83 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.db.models import Count, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.exceptions import (AuthenticationFailed,
+                                       NotAuthenticated, PermissionDenied)
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api.authentication import authenticate_request, invalidate_user_tokens
 from api.filters import IngredientFilter, RecipeFilter
+from api.mixins import get_sparse_fields
 from api.paginators import LimitPagination
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import FastJSONRenderer
+from api.representations import RecipeReader
 from api.serializers import (
     AvatarChangeSerializer, FavoriteWriteSerializer, FollowWriteSerializer,
-    IngredientSerializer, RecipeReadSerializer, RecipeWriteSerializer,
-    ShoppingCartWriteSerializer, SubscriptionSerializer, TagSerializer
+    IngredientSerializer, PantrySearchSerializer, PopularitySerializer,
+    RecipeMiniReadSerializer, RecipeReadSerializer, RecipeWriteSerializer,
+    ShoppingCartWriteSerializer, SubscriptionSerializer, TagSerializer,
+    UserSerializer
 )
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from foodgram_backend.async_views import AsyncViewMixin
+from foodgram_backend.sqlite import retry_on_busy
+from recipes.models import (Favorite, Ingredient, IngredientPopularity,
+                            Recipe, RecipeIngredient, ShoppingCart,
+                            SimilarRecipe, Tag, TagPopularity)
+from recipes.pantry import search_recipes
+from recipes.popularity import top
 from users.models import Follow
 
 User = get_user_model()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class PopularityMixin:
+    """
+    Добавляет сотрудникам выборку самых популярных объектов за период
+    из дневных сводок popularity_model (см. команду update_popularity).
+    """
+    popularity_model = None
+    popularity_key = None
+
+    @action(detail=False, permission_classes=(IsAdminUser,))
+    def popular(self, request):
+        params = PopularitySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        rows = top(self.popularity_model, self.popularity_key,
+                   **params.validated_data)
+        objects = self.get_queryset().in_bulk([pk for pk, _ in rows])
+        return Response([
+            {**self.get_serializer(objects[pk]).data, **totals}
+            for pk, totals in rows if pk in objects
+        ])
+
+
+class TagViewSet(PopularityMixin, ReadOnlyModelViewSet):
     """Вьюсет для чтения списка/объекта тега."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    popularity_model = TagPopularity
+    popularity_key = 'tag_id'
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(PopularityMixin, ReadOnlyModelViewSet):
     """Вьюсет для чтения списка/объекта ингредиента."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    popularity_model = IngredientPopularity
+    popularity_key = 'ingredient_id'
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -45,18 +88,48 @@ class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     pagination_class = LimitPagination
     lookup_field = 'pk'
+    sparse_actions = ('list', 'retrieve', 'me', 'subscriptions',
+                      'suggestions')
 
     def get_permissions(self):
         if self.action == 'me':
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def get_sparse_fields(self, serializer_class):
+        if (self.action not in self.sparse_actions
+                or self.request.method != 'GET'):
+            return None
+        return get_sparse_fields(self.request, serializer_class.Meta.fields)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields(UserSerializer)
+        if fields is not None:
+            queryset = queryset.only(
+                'id',
+                *(field for field in fields if field != 'is_subscribed')
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields(self.get_serializer_class())
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # Имя и почта хранятся в снимке пользователя в кеше токенов.
+        invalidate_user_tokens(serializer.instance.pk)
+
     @action(['put', 'delete'], detail=False,
             url_path='me/avatar', permission_classes=(IsAuthenticated,))
     def avatar(self, request):
         user = self.request.user
         if request.method == 'DELETE':
             user.avatar.delete()
+            invalidate_user_tokens(user.pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
         serializer = AvatarChangeSerializer(
             user,
@@ -65,10 +138,12 @@ class UserViewSet(DjoserUserViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        invalidate_user_tokens(user.pk)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(['post', 'delete'], detail=True,
             permission_classes=(IsAuthenticated,))
+    @retry_on_busy
     def subscribe(self, request, pk):
         if request.method == 'POST':
             data = {"user": request.user.id, "following": pk}
@@ -91,12 +166,42 @@ class UserViewSet(DjoserUserViewSet):
 
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
-        subs = User.objects.filter(followers__user=self.request.user)
+        fields = self.get_sparse_fields(SubscriptionSerializer)
+        subs = User.objects.filter(
+            followers__user=self.request.user
+        ).only('id', *(
+            field for field in fields
+            if field in UserSerializer.Meta.fields
+            and field != 'is_subscribed'
+        ))
+        if 'recipes_count' in fields:
+            subs = subs.annotate(
+                recipes_count=Count('recipes')
+            ).order_by(*User._meta.ordering)
         page = self.paginate_queryset(subs)
         serializer = SubscriptionSerializer(
             page,
             many=True,
-            context={'request': request}
+            context={'request': request},
+            fields=fields,
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def suggestions(self, request):
+        """Авторы, на которых подписаны подписчики тех же авторов."""
+        fields = self.get_sparse_fields(UserSerializer)
+        authors = User.objects.filter(
+            suggested_to__user=request.user
+        ).order_by('-suggested_to__score').only('id', *(
+            field for field in fields if field != 'is_subscribed'
+        ))
+        page = self.paginate_queryset(authors)
+        serializer = UserSerializer(
+            page,
+            many=True,
+            context={'request': request},
+            fields=fields,
         )
         return self.get_paginated_response(serializer.data)
 
@@ -125,6 +230,42 @@ class RecipeViewSet(ModelViewSet):
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
+    def get_reader(self):
+        return RecipeReader(
+            self.request,
+            get_sparse_fields(self.request, RecipeReader.all_fields),
+        )
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        queryset = reader.get_values(self.filter_queryset(self.get_queryset()))
+        if 'stream' in request.query_params:
+            return self.stream_list(reader, queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.represent(page))
+        return Response(reader.represent(queryset))
+
+    def stream_list(self, reader, queryset):
+        """
+        Выгрузка всего списка одним JSON-массивом без пагинации.
+        Доступна только сотрудникам.
+        """
+        if not self.request.user.is_staff:
+            raise PermissionDenied('Выгрузка доступна только сотрудникам.')
+        return StreamingHttpResponse(
+            reader.stream(queryset, settings.STREAM_CHUNK_SIZE),
+            content_type='application/json',
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        row = get_object_or_404(
+            reader.get_values(self.filter_queryset(self.get_queryset())),
+            pk=self.kwargs[self.lookup_field],
+        )
+        return Response(reader.represent([row])[0])
+
     @staticmethod
     def create_recipe_subscription(request, pk, serializer_class):
         data = {"user": request.user.id, "recipe": pk}
@@ -145,6 +286,7 @@ class RecipeViewSet(ModelViewSet):
 
     @action(['post', 'delete'], detail=True,
             permission_classes=(IsAuthenticated,))
+    @retry_on_busy
     def favorite(self, request, pk):
         if request.method == 'POST':
             return self.create_recipe_subscription(
@@ -156,6 +298,7 @@ class RecipeViewSet(ModelViewSet):
 
     @action(['post', 'delete'], detail=True,
             permission_classes=(IsAuthenticated,))
+    @retry_on_busy
     def shopping_cart(self, request, pk):
         if request.method == 'POST':
             return self.create_recipe_subscription(
@@ -165,45 +308,111 @@ class RecipeViewSet(ModelViewSet):
             )
         return self.delete_recipe_subscription(ShoppingCart)
 
-    def create_shopping_list(self, product_list):
-        user = self.request.user
-        product_dict = {}
-        for product in product_list:
-            name = product[0]
-            if name not in product_dict:
-                product_dict[name] = {
-                    'Единица измерения': product[1],
-                    'Кол-во': product[2]
-                }
-            else:
-                product_dict[name]['Кол-во'] += product[2]
-        shopping_list = ''
-        for name, value in product_dict.items():
-            shopping_list += (
-                f"{name}: {value['Кол-во']} {value['Единица измерения']}.\n"
-            )
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = (
-            f'attachment; filename="{user.username}`s_shopping_list.txt"'
-        )
-        return response
+    @action(detail=True)
+    def similar(self, request, pk):
+        """Похожие рецепты по ингредиентам и тегам, от самых похожих."""
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        similar_ids = list(SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).order_by('-score').values_list('similar_id', flat=True))
+        recipes = Recipe.objects.in_bulk(similar_ids)
+        return Response(RecipeMiniReadSerializer(
+            [recipes[pk] for pk in similar_ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        ).data)
 
-    @action(detail=False, permission_classes=(IsAuthenticated,))
-    def download_shopping_cart(self, request):
-        product_list = Recipe.objects.filter(
-            shopping_cart__user=self.request.user
-        ).values_list(
-            'recipe_ingredients__ingredient__name',
-            'recipe_ingredients__ingredient__measurement_unit',
-            'recipe_ingredients__amount'
-        )
-        if not product_list:
-            return Response({"message": "Список покупок пуст."},
-                            status=status.HTTP_200_OK)
-        return self.create_shopping_list(product_list)
+    @action(detail=False)
+    def pantry(self, request):
+        """
+        Рецепты, которые можно приготовить из продуктов ingredients,
+        докупив не более max_missing ингредиентов.
+        """
+        params = PantrySearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        page = self.paginate_queryset(search_recipes(
+            params.validated_data['ingredients'],
+            params.validated_data['max_missing'],
+        ))
+        reader = self.get_reader()
+        rows = {
+            row['id']: row for row in reader.get_values(
+                self.get_queryset().filter(id__in=[pk for pk, _ in page])
+            )
+        }
+        # Рецепт мог быть удалён после построения индекса.
+        found = [(rows[pk], missing) for pk, missing in page if pk in rows]
+        results = reader.represent(row for row, _ in found)
+        for recipe, (_, missing) in zip(results, found):
+            recipe['missing_ingredients'] = missing
+        return self.get_paginated_response(results)
 
     @action(detail=True, url_path='get-link')
     def get_link(self, request, pk):
         short_url = self.get_object().short_url
         return Response(
             {"short-link": request.build_absolute_uri(f'/s/{short_url}')})
+
+
+def json_response(data, status=status.HTTP_200_OK, **headers):
+    """Ответ в том же JSON-формате, что и у представлений DRF."""
+    response = HttpResponse(FastJSONRenderer().render(data),
+                            content_type='application/json', status=status)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+class IngredientSearchView(AsyncViewMixin, View):
+    """
+    Поиск ингредиентов по началу названия (асинхронно под ASGI),
+    отдаёт тот же ответ, что и список IngredientViewSet.
+    """
+    def get(self, request):
+        queryset = Ingredient.objects.values('id', 'name', 'measurement_unit')
+        name = request.GET.get('name')
+        if name:
+            queryset = queryset.filter(name__istartswith=name)
+        return json_response(list(queryset))
+
+
+class ShoppingCartDownloadView(AsyncViewMixin, View):
+    """
+    Скачивание списка покупок (асинхронно под ASGI): количества
+    суммируются в БД, по строке на ингредиент, а строки файла формируются
+    и отдаются потоком по мере отправки.
+    """
+    def get(self, request):
+        try:
+            user = authenticate_request(request)
+        except AuthenticationFailed as error:
+            return json_response({'detail': str(error.detail)},
+                                 status=error.status_code,
+                                 **{'WWW-Authenticate': 'Token'})
+        if user is None:
+            return json_response({'detail': NotAuthenticated.default_detail},
+                                 status=status.HTTP_401_UNAUTHORIZED,
+                                 **{'WWW-Authenticate': 'Token'})
+        product_list = list(RecipeIngredient.objects.filter(
+            recipe__shopping_cart__user=user
+        ).values_list(
+            'ingredient__name',
+            'ingredient__measurement_unit'
+        ).annotate(
+            total=Sum('amount')
+        ).order_by('ingredient__name', 'ingredient__measurement_unit'))
+        if not product_list:
+            return json_response({"message": "Список покупок пуст."})
+        response = StreamingHttpResponse(
+            self.create_shopping_list(product_list),
+            content_type='text/plain',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{user.username}`s_shopping_list.txt"'
+        )
+        return response
+
+    @staticmethod
+    def create_shopping_list(product_list):
+        for name, measurement_unit, amount in product_list:
+            yield f'{name}: {amount} {measurement_unit}.\n'
@@ -0,0 +1,69 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+# Выборки меньше этого числа строк считаются точным COUNT(*).
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк queryset без его полного подсчёта или None,
+    если оценить нельзя: на PostgreSQL - по плану запроса, на SQLite -
+    по наибольшему первичному ключу таблицы без фильтров.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+    if not queryset.query.has_filters():
+        return queryset.model._default_manager.using(queryset.db).aggregate(
+            last=Max('pk')
+        )['last'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор списков админки для больших таблиц: точный COUNT(*)
+    выполняется, только если оценка меньше EXACT_COUNT_LIMIT.
+    """
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < EXACT_COUNT_LIMIT:
+            return self.object_list.count()
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Базовый класс админки таблиц-связей с миллионами строк: оценочный
+    подсчёт строк и поиск по началу значения (с учётом регистра)
+    в полях связанных моделей из search_fields вида 'user__username'.
+
+    Каждое поле поиска превращается в подзапрос id__in, который
+    выполняется по индексу связанной таблицы, а условия OR между ними
+    - по индексам внешних ключей большой таблицы.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for path in self.get_search_fields(request):
+            relation, field = path.split('__', 1)
+            related_model = self.model._meta.get_field(relation).related_model
+            condition |= Q(**{
+                f'{relation}__in': related_model._default_manager.filter(
+                    **{f'{field}__startswith': term}
+                ).values('pk')
+            })
+        return queryset.filter(condition), False
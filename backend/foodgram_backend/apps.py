@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class FoodgramBackendConfig(AppConfig):
+    name = 'foodgram_backend'
+    verbose_name = 'Инфраструктура'
+
+    def ready(self):
+        import foodgram_backend.deadlines  # noqa: F401
+        import foodgram_backend.sqlite  # noqa: F401
@@ -9,8 +9,30 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.sync import sync_to_async
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from recipes.clicks import flush_on_exit  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Приложение Django с обработкой событий lifespan, которых Django 3.2
+    не поддерживает: при остановке воркера uvicorn записывает накопленные
+    переходы по коротким ссылкам (atexit и worker_exit gunicorn после
+    SIGTERM в воркере uvicorn не вызываются).
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await sync_to_async(flush_on_exit, thread_sensitive=False)()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from foodgram_backend.profiling import current_profile
+
+# Ограниченный пул потоков для обращений к БД из асинхронных представлений:
+# число одновременно открытых соединений не превышает его размера.
+db_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS,
+                                 thread_name_prefix='async-db')
+
+
+def _call_with_connection(func, *args, **kwargs):
+    close_old_connections()
+    profile = current_profile.get()
+    if profile is None:
+        return func(*args, **kwargs)
+    with profile.attached():
+        return func(*args, **kwargs)
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию func в пуле потоков для работы с БД."""
+    return await sync_to_async(
+        _call_with_connection,
+        thread_sensitive=False,
+        executor=db_executor,
+    )(func, *args, **kwargs)
+
+
+class AsyncViewMixin:
+    """
+    Представление-класс с обычными синхронными обработчиками, которое под
+    ASGI (settings.ASGI) выполняется целиком в пуле потоков БД: Django 3.2
+    запускает синхронные представления в одном общем потоке, и запросы
+    шли бы по очереди. Под WSGI as_view() возвращает обычное синхронное
+    представление без затрат на цикл событий.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if settings.ASGI:
+            return cls.as_async_view(**initkwargs)
+        return super().as_view(**initkwargs)
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await run_db(view, request, *args, **kwargs)
+
+        update_wrapper(async_view, view)
+        return async_view
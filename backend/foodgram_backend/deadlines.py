@@ -0,0 +1,142 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Крайний срок текущего запроса по time.monotonic() или None.
+request_deadline = ContextVar('request_deadline', default=None)
+
+# Код ошибки Postgres при срабатывании statement_timeout.
+QUERY_CANCELED = '57014'
+
+
+class ServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис временно перегружен, повторите запрос позже.'
+    default_code = 'service_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # DRF превращает wait в заголовок Retry-After.
+        self.wait = wait or settings.REQUEST_RETRY_AFTER
+
+
+class DeadlineExceeded(ServiceUnavailable):
+    default_detail = 'Сервер не успел обработать запрос, повторите позже.'
+    default_code = 'deadline_exceeded'
+
+
+def get_budget(view_name):
+    """Возвращает ограничения для представления из REQUEST_BUDGETS."""
+    return settings.REQUEST_BUDGETS.get(view_name)
+
+
+def is_timeout(error):
+    """Прерван ли запрос к БД по крайнему сроку."""
+    if not isinstance(error, OperationalError):
+        return False
+    return (getattr(error.__cause__, 'pgcode', None) == QUERY_CANCELED
+            or str(error) == 'interrupted')
+
+
+def check_deadline(execute, sql, params, many, context):
+    """
+    Обёртка всех запросов к БД: не отправляет запрос после крайнего
+    срока, а на Postgres ограничивает каждый запрос оставшимся временем
+    через statement_timeout.
+    """
+    deadline = request_deadline.get()
+    connection = context['connection']
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded
+        if connection.vendor == 'postgresql':
+            # Остаток округляется вниз до шага: запрос не переживает
+            # крайний срок, а SET повторяется не чаще раза за шаг.
+            step = settings.STATEMENT_TIMEOUT_STEP_MS
+            timeout = max(int(remaining * 1000) // step * step, 1)
+            if connection.statement_timeout != timeout:
+                connection.statement_timeout = timeout
+                with connection.cursor() as cursor:
+                    cursor.execute('SET statement_timeout = %s', [timeout])
+    elif connection.statement_timeout is not None:
+        connection.statement_timeout = None
+        with connection.cursor() as cursor:
+            cursor.execute('SET statement_timeout = DEFAULT')
+    return execute(sql, params, many, context)
+
+
+def interrupt_sqlite():
+    """Обработчик прогресса SQLite: ненулевой ответ прерывает запрос."""
+    deadline = request_deadline.get()
+    return deadline is not None and time.monotonic() > deadline
+
+
+@receiver(connection_created)
+def watch_deadlines(sender, connection, **kwargs):
+    # Без ограничений обёртка и обработчик прогресса только замедляли бы
+    # все запросы.
+    if not settings.REQUEST_BUDGETS:
+        return
+    connection.statement_timeout = None
+    if check_deadline not in connection.execute_wrappers:
+        connection.execute_wrappers.append(check_deadline)
+    if connection.vendor == 'sqlite':
+        connection.connection.set_progress_handler(
+            interrupt_sqlite, settings.SQLITE_PROGRESS_STEPS
+        )
+
+
+class InFlight:
+    """
+    Счётчик выполняющихся запросов по представлениям в кеше Django.
+
+    С общим кешем (Redis, Memcached) лимит действует на все воркеры.
+    Каждое занятие места продлевает запись на ttl секунд, поэтому места,
+    не освобождённые упавшим воркером, возвращаются через ttl секунд
+    без запросов к представлению. Счётчик не опускается ниже нуля, даже
+    если запись истекла, пока запросы выполнялись.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    @staticmethod
+    def get_key(view_name):
+        return f'in-flight:{view_name}'
+
+    def acquire(self, view_name, limit):
+        """Занимает место, если выполняется меньше limit запросов."""
+        key = self.get_key(view_name)
+        cache.add(key, 0, self.ttl)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # Запись истекла между add и incr.
+            cache.add(key, 1, self.ttl)
+            return True
+        cache.touch(key, self.ttl)
+        if count > limit:
+            self.release(view_name)
+            return False
+        return True
+
+    def release(self, view_name):
+        key = self.get_key(view_name)
+        try:
+            count = cache.decr(key)
+        except ValueError:
+            # Запись истекла: освобождать нечего.
+            return
+        if count < 0:
+            # Запись истекла и создана заново, пока запрос выполнялся.
+            cache.incr(key, -count)
+
+
+in_flight = InFlight(settings.REQUEST_IN_FLIGHT_TTL)
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Статистика SQL текущего HTTP-запроса или None. Переменная контекста
+# копируется в потоки run_db, поэтому запросы асинхронных представлений
+# учитываются в статистике своего HTTP-запроса.
+current_stats = ContextVar('query_stats', default=None)
+
+
+def get_view_name(request):
+    """
+    Возвращает имя обработавшего запрос представления
+    в виде `RecipeViewSet.list` или `ShortUrlRedirectView`.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = (getattr(match.func, 'cls', None)
+                  or getattr(match.func, 'view_class', None))
+    if view_class is None:
+        return match.view_name or match.func.__name__
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if action:
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+class QueryStats:
+    """
+    Статистика SQL-запросов в рамках одного HTTP-запроса. Запросы
+    могут выполняться в нескольких потоках (см. run_db). Запросы
+    учитываются и во внешней статистике parent, если она задана.
+    """
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+    def record(self, sql, duration):
+        with self.lock:
+            self.db_time += duration
+            self.count += 1
+            self.statements[sql] += 1
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+    @property
+    def duplicate_count(self):
+        return self.count - len(self.statements)
+
+    def top_duplicates(self, limit):
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common(limit)
+            if count > 1
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка соединений: передаёт запрос статистике текущего запроса."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def add_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def enable_query_tracking():
+    """
+    Подключает record_query ко всем соединениям с БД, в том числе
+    к соединениям потоков run_db. Вызывается только при включённом
+    сборе статистики, чтобы не замедлять остальные запросы.
+    """
+    connection_created.connect(add_query_wrapper,
+                               dispatch_uid='record-query')
+    for connection in connections.all():
+        add_query_wrapper(None, connection)
+
+
+@contextmanager
+def track_queries(request):
+    """
+    Собирает статистику SQL-запросов на время обработки запроса
+    (нужен вызов enable_query_tracking). Если статистика уже собирается
+    внешним middleware, возвращает её же.
+    """
+    stats = getattr(request, 'query_stats', None)
+    if stats is not None:
+        yield stats
+        return
+    stats = request.query_stats = QueryStats(current_stats.get())
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
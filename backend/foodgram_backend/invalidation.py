@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.module_loading import import_string
+
+from foodgram_backend.models import CacheVersion
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+NAMESPACES = (RECIPES, TAGS, INGREDIENTS)
+
+
+class DatabaseBackend:
+    """
+    Хранит версии пространств имён в таблице CacheVersion: публикация
+    увеличивает версию, воркеры периодически читают всю таблицу.
+    """
+    def publish(self, namespace):
+        if CacheVersion.objects.filter(namespace=namespace).update(
+                version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                CacheVersion.objects.create(namespace=namespace, version=1)
+        except IntegrityError:
+            CacheVersion.objects.filter(namespace=namespace).update(
+                version=F('version') + 1
+            )
+
+    def fetch_versions(self):
+        return dict(CacheVersion.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'namespace', 'version'
+        ))
+
+
+class LocalBackend:
+    """
+    Замена pub/sub внутри одного процесса (разработка, один воркер):
+    события не выходят за пределы процесса и не требуют БД.
+    """
+    def __init__(self):
+        self.versions = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def publish(self, namespace):
+        with self.lock:
+            self.versions[namespace] += 1
+
+    def fetch_versions(self):
+        with self.lock:
+            return dict(self.versions)
+
+
+class InvalidationBus:
+    """
+    Рассылает события об изменении данных кешам процесса.
+
+    Свои изменения процесс применяет сразу после коммита, чужие узнаёт
+    при опросе бэкенда не чаще одного раза в interval секунд.
+    """
+    def __init__(self, backend, interval):
+        self.backend = backend
+        self.interval = interval
+        self.subscribers = defaultdict(list)
+        self.versions = {}
+        self.next_poll = 0
+        self.lock = threading.Lock()
+
+    def subscribe(self, namespace, callback):
+        self.subscribers[namespace].append(callback)
+
+    def publish(self, namespace):
+        self.backend.publish(namespace)
+        self.notify(namespace)
+
+    def notify(self, namespace):
+        for callback in self.subscribers[namespace]:
+            callback()
+
+    def poll_due(self):
+        return time.monotonic() >= self.next_poll
+
+    def poll(self, force=False):
+        now = time.monotonic()
+        if not force and now < self.next_poll:
+            return
+        # Опрашивает один поток, остальные не ждут его.
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.next_poll = now + self.interval
+            versions = self.backend.fetch_versions()
+            for namespace, version in versions.items():
+                if self.versions.get(namespace) != version:
+                    self.notify(namespace)
+            self.versions = versions
+        finally:
+            self.lock.release()
+
+
+bus = InvalidationBus(import_string(settings.INVALIDATION_BACKEND)(),
+                      settings.INVALIDATION_POLL_MS / 1000)
+
+
+def subscribe(namespace, callback):
+    """Вызывает callback() при каждом изменении данных namespace."""
+    bus.subscribe(namespace, callback)
+
+
+def publish(namespace, using=DEFAULT_DB_ALIAS):
+    """
+    Публикует изменение namespace после коммита текущей транзакции -
+    один раз, сколько бы объектов в ней ни изменилось.
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block:
+        # Django заменяет список run_on_commit при коммите и откате,
+        # вместе с ним устаревает и набор уже запланированных публикаций.
+        hooks, pending = getattr(connection, 'pending_invalidations',
+                                 (None, None))
+        if hooks is not connection.run_on_commit:
+            pending = set()
+            connection.pending_invalidations = (connection.run_on_commit,
+                                                pending)
+        if namespace in pending:
+            return
+        pending.add(namespace)
+    transaction.on_commit(lambda: bus.publish(namespace), using=using)
+
+
+def poll(force=False):
+    bus.poll(force)
+
+
+def poll_due():
+    """Пора ли опрашивать бэкенд (без обращения к нему)."""
+    return bus.poll_due()
+
+
+def get_version(namespace):
+    """
+    Версия namespace, прочитанная при последнем опросе. Одинакова во всех
+    процессах, поэтому годится как версия ключей общего кеша.
+    """
+    return bus.versions.get(namespace, 0)
+
+
+def invalidate_on_change(namespace, *models):
+    """
+    Публикует изменение namespace при сохранении и удалении объектов
+    моделей models, а также при изменении связей многие-ко-многим
+    (для промежуточных моделей).
+    """
+    def handler(sender, using=DEFAULT_DB_ALIAS, action='post', **kwargs):
+        if action.startswith('post'):
+            publish(namespace, using)
+
+    for model in models:
+        for signal in (post_save, post_delete, m2m_changed):
+            signal.connect(
+                handler, sender=model, weak=False,
+                dispatch_uid=f'invalidate-{namespace}-{model._meta.label}',
+            )
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from math import ceil
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe
+
+User = get_user_model()
+
+MODES = {
+    'wsgi': {'ASGI': 'False'},
+    'asgi': {'ASGI': 'True'},
+}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+async def fetch(host, port, path, headers):
+    """Выполняет GET-запрос и возвращает статус ответа."""
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+    for name, value in headers.items():
+        request += f'{name}: {value}\r\n'
+    writer.write((request + 'Connection: close\r\n\r\n').encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def load(host, port, path, headers, concurrency, duration):
+    """
+    Держит concurrency одновременных соединений в течение duration секунд
+    и возвращает задержки успешных запросов и число ошибок.
+    """
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(host, port, path, headers)
+            except OSError:
+                status = None
+            if status is None or status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий сравнение gunicorn с синхронными воркерами
+    и с воркерами uvicorn (ASGI) на асинхронных эндпоинтах.
+    """
+    help = ('Поочерёдно запускает gunicorn в режимах WSGI и ASGI '
+            'и замеряет пропускную способность асинхронных эндпоинтов '
+            'при большом числе одновременных соединений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        scenarios = self.get_scenarios()
+        for mode in options['modes']:
+            server = self.start_server(mode, options)
+            try:
+                for name, (path, headers) in scenarios.items():
+                    latencies, errors = asyncio.run(load(
+                        options['host'], options['port'], path, headers,
+                        options['concurrency'], options['duration'],
+                    ))
+                    self.print_result(mode, name, latencies, errors,
+                                      options['duration'])
+            finally:
+                server.terminate()
+                server.wait()
+
+    def get_scenarios(self):
+        """Возвращает сценарии вида {имя: (путь, заголовки)}."""
+        shopper = (User.objects.annotate(count=Count('shopping_cart'))
+                   .order_by('-count').first())
+        recipe = Recipe.objects.order_by('pk').first()
+        ingredient = Ingredient.objects.order_by('pk').first()
+        if not all((shopper, recipe, ingredient)):
+            raise CommandError('Недостаточно данных, выполните '
+                               'generate_dataset.')
+        token = Token.objects.get_or_create(user=shopper)[0]
+        return {
+            'short_url.redirect': (f'/s/{recipe.short_url}/', {}),
+            'ingredients.search': (
+                f'/api/ingredients/?name={quote(ingredient.name[:2])}', {}),
+            'recipes.download_shopping_cart': (
+                '/api/recipes/download_shopping_cart/',
+                {'Authorization': f'Token {token.key}'},
+            ),
+        }
+
+    def start_server(self, mode, options):
+        env = {
+            **os.environ,
+            **MODES[mode],
+            'GUNICORN_BIND': f'{options["host"]}:{options["port"]}',
+        }
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn',
+             '--workers', str(options['workers'])],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn ({mode}) не запустился.')
+            try:
+                socket.create_connection(
+                    (options['host'], options['port']), timeout=1
+                ).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'gunicorn ({mode}) не отвечает.')
+
+    def print_result(self, mode, name, latencies, errors, duration):
+        if not latencies:
+            self.stdout.write(f'{mode:<5} {name:<34} ошибок: {errors}')
+            return
+        self.stdout.write(
+            f'{mode:<5} {name:<34} {len(latencies) / duration:>8.1f} rps  '
+            f'p50 {percentile(latencies, 50) * 1000:>8.2f} мс  '
+            f'p95 {percentile(latencies, 95) * 1000:>8.2f} мс  '
+            f'ошибок: {errors}'
+        )
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+
+from foodgram_backend import invalidation
+from recipes.models import Tag
+
+TAG_SLUG = 'invalidation-check'
+
+
+def run_worker(tag_id, stop, results):
+    """
+    Держит название тега в кеше процесса, перечитывая его из БД только
+    после события об изменении тегов, и сообщает о каждом новом значении.
+    """
+    cached = {}
+    invalidation.subscribe(invalidation.TAGS, cached.clear)
+    seen = None
+    while not stop.is_set():
+        invalidation.poll()
+        if 'name' not in cached:
+            cached['name'] = Tag.objects.values_list(
+                'name', flat=True
+            ).get(pk=tag_id)
+        if cached['name'] != seen:
+            seen = cached['name']
+            results.put((os.getpid(), seen, time.time()))
+        time.sleep(0.005)
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий проверку согласованности кешей нескольких
+    процессов после изменения данных.
+    """
+    help = ('Запускает несколько процессов с кешем названия тега, '
+            'переименовывает тег и проверяет, что все процессы увидели '
+            'новое значение за время опроса INVALIDATION_POLL_MS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument('--timeout', type=float, default=5,
+                            help='Сколько секунд ждать сверх интервала '
+                                 'опроса.')
+
+    def handle(self, *args, **options):
+        tag = Tag.objects.create(name=f'{TAG_SLUG}-0', slug=TAG_SLUG)
+        connections.close_all()
+        stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=run_worker,
+                                    args=(tag.pk, stop, results))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        timeout = settings.INVALIDATION_POLL_MS / 1000 + options['timeout']
+        try:
+            self.wait_for(results, tag.name, len(processes), time.time(),
+                          timeout)
+            lags = []
+            for round_number in range(1, options['rounds'] + 1):
+                tag.name = f'{TAG_SLUG}-{round_number}'
+                tag.save()
+                lags.extend(self.wait_for(results, tag.name, len(processes),
+                                          time.time(), timeout))
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+            tag.delete()
+
+        lags.sort()
+        self.stdout.write(
+            f'Процессов: {len(processes)}, изменений: {options["rounds"]}, '
+            f'задержка: медиана {lags[len(lags) // 2] * 1000:.0f} мс, '
+            f'максимум {lags[-1] * 1000:.0f} мс '
+            f'(интервал опроса {settings.INVALIDATION_POLL_MS} мс).'
+        )
+
+    @staticmethod
+    def wait_for(results, name, count, started, timeout):
+        """Ждёт, пока все процессы увидят name, и возвращает задержки."""
+        lags = {}
+        deadline = started + timeout
+        while len(lags) < count:
+            try:
+                pid, seen, at = results.get(
+                    timeout=max(deadline - time.time(), 0)
+                )
+            except queue.Empty:
+                raise CommandError(
+                    f'{count - len(lags)} из {count} процессов не увидели '
+                    f'изменение за {timeout:.1f} с.'
+                )
+            if seen == name:
+                lags[pid] = max(at - started, 0)
+        return list(lags.values())
@@ -0,0 +1,70 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Если задана переменная окружения PROMETHEUS_MULTIPROC_DIR, значения
+хранятся в файлах этого каталога и суммируются по всем воркерам gunicorn
+при каждом запросе к /metrics.
+"""
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = tuple(100 * 4 ** power for power in range(10))
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+    ('view', 'method', 'status'),
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_db_queries',
+    'Число SQL-запросов за один HTTP-запрос.',
+    ('view',),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_response_size_bytes',
+    'Размер тела ответа.',
+    ('view',),
+    buckets=SIZE_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кешам приложения.',
+    ('cache', 'result'),
+)
+
+
+def observe_request(view, method, status, duration, queries, size):
+    """Записывает метрики одного обработанного запроса."""
+    REQUEST_LATENCY.labels(view, method, status).observe(duration)
+    REQUEST_QUERIES.labels(view).observe(queries)
+    if size is not None:
+        RESPONSE_SIZE.labels(view).observe(size)
+
+
+def observe_cache(cache, hit):
+    """Записывает попадание или промах кеша с именем cache."""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Отдаёт текущие значения метрик в текстовом формате Prometheus."""
+    return HttpResponse(generate_latest(get_registry()),
+                        content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,502 @@
+import asyncio
+import logging
+import time
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+from api.authentication import authenticate_request
+from api.renderers import FastJSONRenderer
+from foodgram_backend import invalidation, metrics
+from foodgram_backend.async_views import run_db
+from foodgram_backend.cache import LocalTTLCache, is_shared_cache
+from foodgram_backend.deadlines import (DeadlineExceeded, ServiceUnavailable,
+                                        get_budget, in_flight, is_timeout,
+                                        request_deadline)
+from foodgram_backend.instrumentation import (enable_query_tracking,
+                                              get_view_name, track_queries)
+from foodgram_backend.profiling import RequestProfile, current_profile
+from foodgram_backend.routers import choose_replica, read_database
+
+logger = logging.getLogger('foodgram.performance')
+
+
+def run_inline(method):
+    """Асинхронная обёртка для быстрого метода без обращений к БД."""
+    async def wrapper(*args):
+        return method(*args)
+    return wrapper
+
+
+class AsyncCapableMiddleware:
+    """
+    Промежуточный слой с синхронным (handle) и асинхронным (ahandle)
+    путём. Под ASGI Django вызывает ahandle() прямо в цикле событий,
+    и запрос не уходит в общий для всех синхронный поток, в котором
+    запросы выполнялись бы по очереди.
+
+    Хуки process_view и process_template_response в асинхронном режиме
+    вызываются без перехода в синхронный поток; если хук обращается
+    к БД или кешу, подкласс задаёт его асинхронный вариант
+    (aprocess_view). process_exception Django всегда вызывает синхронно.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if not self.is_async:
+            return
+        # По этому признаку Django считает экземпляр асинхронным,
+        # как и в MiddlewareMixin.
+        self._is_coroutine = asyncio.coroutines._is_coroutine
+        for name in ('process_view', 'process_template_response'):
+            if hasattr(self, 'a' + name):
+                setattr(self, name, getattr(self, 'a' + name))
+            elif hasattr(self, name):
+                setattr(self, name, run_inline(getattr(self, name)))
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def ahandle(self, request):
+        raise NotImplementedError
+
+
+class InvalidationMiddleware(AsyncCapableMiddleware):
+    """
+    Перед обработкой запроса проверяет, не изменились ли данные
+    в других процессах, и сбрасывает устаревшие кеши процесса.
+    """
+    def handle(self, request):
+        invalidation.poll()
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        if invalidation.poll_due():
+            await run_db(invalidation.poll)
+        return await self.get_response(request)
+
+
+class QueryInstrumentationMiddleware(AsyncCapableMiddleware):
+    """
+    Считает SQL-запросы, время работы с БД и повторяющиеся запросы,
+    добавляет заголовок Server-Timing и логирует запросы,
+    превысившие заданные лимиты.
+
+    При SQL_INSTRUMENTATION = False не подключается к цепочке вовсе.
+    """
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        enable_query_tracking()
+        super().__init__(get_response)
+
+    def handle(self, request):
+        start = time.perf_counter()
+        with track_queries(request) as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, stats, start)
+
+    async def ahandle(self, request):
+        start = time.perf_counter()
+        with track_queries(request) as stats:
+            response = await self.get_response(request)
+        return self.finish(request, response, stats, start)
+
+    def finish(self, request, response, stats, start):
+        total = time.perf_counter() - start
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f}, '
+            f'serialize;dur={stats.render_time * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        if (stats.count > settings.SQL_QUERY_BUDGET
+                or total * 1000 > settings.SQL_LATENCY_BUDGET_MS):
+            self.log_slow_request(request, stats, total)
+        return response
+
+    def process_template_response(self, request, response):
+        stats = request.query_stats
+        render_start = time.perf_counter()
+
+        def finish_render(response):
+            stats.render_time += time.perf_counter() - render_start
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, stats, total):
+        duplicates = '\n'.join(
+            f'  {count}x {sql}'
+            for sql, count in stats.top_duplicates(
+                settings.SQL_DUPLICATES_LOG_LIMIT
+            )
+        )
+        logger.warning(
+            '%s %s (%s): %d запросов к БД (%d повторов), '
+            'БД %.1f мс, всего %.1f мс%s',
+            request.method,
+            request.path,
+            get_view_name(request),
+            stats.count,
+            stats.duplicate_count,
+            stats.db_time * 1000,
+            total * 1000,
+            f'\nПовторяющиеся запросы:\n{duplicates}' if duplicates else '',
+        )
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Собирает метрики Prometheus по каждому представлению: время ответа,
+    число запросов к БД и размер ответа.
+
+    При METRICS_ENABLED = False не подключается к цепочке вовсе.
+    """
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        enable_query_tracking()
+        super().__init__(get_response)
+
+    def handle(self, request):
+        start = time.perf_counter()
+        with track_queries(request) as stats:
+            response = self.get_response(request)
+        return self.observe(request, response, stats, start)
+
+    async def ahandle(self, request):
+        start = time.perf_counter()
+        with track_queries(request) as stats:
+            response = await self.get_response(request)
+        return self.observe(request, response, stats, start)
+
+    @staticmethod
+    def observe(request, response, stats, start):
+        metrics.observe_request(
+            view=get_view_name(request),
+            method=request.method,
+            status=response.status_code,
+            duration=time.perf_counter() - start,
+            queries=stats.count,
+            size=None if response.streaming else len(response.content),
+        )
+        return response
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Профилирует отдельный запрос по требованию сотрудника: заголовок
+    X-Profile или параметр ?profile в запросе пользователя с is_staff.
+    Профиль сохраняется в PROFILING_DIR, имя файлов возвращается
+    в заголовке X-Profile-Id.
+
+    При PROFILING_ENABLED = False не подключается к цепочке вовсе.
+    """
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        enable_query_tracking()
+        super().__init__(get_response)
+
+    def handle(self, request):
+        if not (self.is_requested(request) and self.is_staff(request)):
+            return self.get_response(request)
+        start = time.perf_counter()
+        with track_queries(request) as stats:
+            with RequestProfile(settings.PROFILING_DIR,
+                                settings.PROFILING_SAMPLE_INTERVAL) as profile:
+                response = self.get_response(request)
+        return self.save(request, response, profile, stats, start)
+
+    async def ahandle(self, request):
+        if not (self.is_requested(request)
+                and await run_db(self.is_staff, request)):
+            return await self.get_response(request)
+        start = time.perf_counter()
+        request.sync_thread_profiler = None
+        # Цикл событий выполняет и чужие запросы, поэтому в профиль
+        # попадают только потоки, выполняющие код этого запроса.
+        with track_queries(request) as stats:
+            with RequestProfile(settings.PROFILING_DIR,
+                                settings.PROFILING_SAMPLE_INTERVAL,
+                                attach_current=False) as profile:
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    if request.sync_thread_profiler is not None:
+                        await sync_to_async(profile.detach_thread)(
+                            request.sync_thread_profiler
+                        )
+        return self.save(request, response, profile, stats, start)
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        # Синхронное представление Django выполнит в общем синхронном
+        # потоке, его и подключаем к профилю. В профиль попадёт и код
+        # других синхронных представлений, выполнявшихся в нём в это время.
+        profile = current_profile.get()
+        if profile is not None and not asyncio.iscoroutinefunction(view_func):
+            request.sync_thread_profiler = await sync_to_async(
+                profile.attach_thread
+            )()
+        return None
+
+    @staticmethod
+    def is_requested(request):
+        return 'HTTP_X_PROFILE' in request.META or 'profile' in request.GET
+
+    @staticmethod
+    def save(request, response, profile, stats, start):
+        response['X-Profile-Id'] = profile.save(
+            get_view_name(request), stats, time.perf_counter() - start
+        )
+        return response
+
+    @staticmethod
+    def is_staff(request):
+        """
+        Проверяет права до вызова представления: токен DRF ещё не
+        разобран, поэтому аутентификаторы API вызываются здесь явно.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        try:
+            user = authenticate_request(request)
+        except APIException:
+            return False
+        return user is not None and user.is_staff
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Отправляет безопасные запросы к представлениям из REPLICA_VIEWS
+    на реплики. После успешной записи клиент получает cookie, и в течение
+    REPLICA_STICKY_SECONDS его запросы читают с основной базы, чтобы он
+    сразу видел свои изменения.
+
+    Без настроенных реплик не подключается к цепочке вовсе.
+    """
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        token = read_database.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return self.set_sticky(request, response)
+
+    async def ahandle(self, request):
+        token = read_database.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return self.set_sticky(request, response)
+
+    @staticmethod
+    def set_sticky(request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                int(time.time()) + settings.REPLICA_STICKY_SECONDS,
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = (getattr(view_func, 'cls', None)
+                      or getattr(view_func, 'view_class', None))
+        if (request.method in SAFE_METHODS
+                and view_class is not None
+                and view_class.__name__ in settings.REPLICA_VIEWS
+                and not self.is_sticky(request)):
+            read_database.set(choose_replica())
+
+    @staticmethod
+    def is_sticky(request):
+        try:
+            until = int(request.COOKIES[settings.REPLICA_STICKY_COOKIE])
+        except (KeyError, ValueError):
+            return False
+        return until > time.time()
+
+
+class RequestBudgetMiddleware(AsyncCapableMiddleware):
+    """
+    Применяет ограничения из REQUEST_BUDGETS к представлениям:
+    крайний срок запроса (timeout_ms) для всех обращений к БД, отказ
+    с 503 и Retry-After при превышении max_in_flight одновременных
+    запросов (счётчики в кеше Django), а для анонимных GET-запросов -
+    ответ из кеша (stale_ttl), если свежий ответ получить не удалось.
+    Сохранённый ответ обновляется не чаще раза в REQUEST_STALE_REFRESH
+    секунд на процесс.
+
+    При пустом REQUEST_BUDGETS не подключается к цепочке вовсе.
+    """
+    def __init__(self, get_response):
+        if not settings.REQUEST_BUDGETS:
+            raise MiddlewareNotUsed
+        self.limit_in_flight = self.check_in_flight_limits()
+        super().__init__(get_response)
+        self.stale_written = LocalTTLCache(
+            maxsize=settings.REQUEST_STALE_KEYS,
+            ttl=settings.REQUEST_STALE_REFRESH,
+        )
+
+    def handle(self, request):
+        self.start(request)
+        token = request_deadline.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_deadline.reset(token)
+            self.release(request)
+        return self.finish(request, response)
+
+    async def ahandle(self, request):
+        self.start(request)
+        token = request_deadline.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_deadline.reset(token)
+            if request.in_flight_view is not None:
+                await run_db(self.release, request)
+        if request.stale_key is None:
+            return response
+        return await run_db(self.finish, request, response)
+
+    @staticmethod
+    def start(request):
+        request.budget_started = time.monotonic()
+        request.in_flight_view = None
+        request.stale_key = None
+
+    @staticmethod
+    def release(request):
+        if request.in_flight_view is not None:
+            in_flight.release(request.in_flight_view)
+
+    def finish(self, request, response):
+        if request.stale_key is None:
+            return response
+        if response.status_code == 503:
+            return self.get_stale_response(request.stale_key) or response
+        if (response.status_code == 200 and not response.streaming
+                and self.stale_written.get(request.stale_key) is None):
+            cache.set(request.stale_key,
+                      (response['Content-Type'], response.content),
+                      request.stale_ttl)
+            self.stale_written.set(request.stale_key, True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = get_view_name(request)
+        budget = get_budget(view_name)
+        if budget is None:
+            return None
+        return self.apply_budget(request, view_name, budget)
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        # Счётчики max_in_flight хранятся в кеше Django, и обращение
+        # к нему не должно блокировать цикл событий.
+        view_name = get_view_name(request)
+        budget = get_budget(view_name)
+        if budget is None:
+            return None
+        return await run_db(self.apply_budget, request, view_name, budget)
+
+    def apply_budget(self, request, view_name, budget):
+        if 'stale_ttl' in budget and self.is_anonymous_read(request):
+            request.stale_key = 'stale-response:' + sha256(
+                f'{request.get_full_path()}|{request.headers.get("Accept")}'
+                .encode()
+            ).hexdigest()
+            request.stale_ttl = budget['stale_ttl']
+        if 'max_in_flight' in budget and self.limit_in_flight:
+            if not in_flight.acquire(view_name, budget['max_in_flight']):
+                return self.unavailable(ServiceUnavailable())
+            request.in_flight_view = view_name
+        if 'timeout_ms' in budget:
+            request_deadline.set(
+                request.budget_started + budget['timeout_ms'] / 1000
+            )
+        return None
+
+    def process_exception(self, request, exception):
+        # Представления DRF сами отвечают на ServiceUnavailable,
+        # остальные получают такой же ответ здесь.
+        if isinstance(exception, ServiceUnavailable):
+            return self.unavailable(exception)
+        if is_timeout(exception):
+            return self.unavailable(DeadlineExceeded())
+        return None
+
+    @staticmethod
+    def check_in_flight_limits():
+        """
+        Счётчики в кеше процесса видят только запросы своего воркера,
+        и при нескольких воркерах лимит max_in_flight действовал бы
+        на каждый из них отдельно. В этом случае он не применяется.
+        """
+        if (settings.SERVER_WORKERS > 1 and not is_shared_cache()
+                and any('max_in_flight' in budget
+                        for budget in settings.REQUEST_BUDGETS.values())):
+            logger.warning(
+                'max_in_flight в REQUEST_BUDGETS не применяется: при %d '
+                'воркерах нужен общий кеш (CACHE_BACKEND).',
+                settings.SERVER_WORKERS,
+            )
+            return False
+        return True
+
+    @staticmethod
+    def is_anonymous_read(request):
+        return (request.method == 'GET'
+                and 'HTTP_AUTHORIZATION' not in request.META
+                and not request.user.is_authenticated)
+
+    @staticmethod
+    def unavailable(exception):
+        """Ответ 503 в формате ошибок DRF."""
+        response = HttpResponse(
+            FastJSONRenderer().render({'detail': str(exception.detail)}),
+            content_type='application/json',
+            status=exception.status_code,
+        )
+        response['Retry-After'] = str(exception.wait)
+        return response
+
+    @staticmethod
+    def get_stale_response(key):
+        stale = cache.get(key)
+        metrics.observe_cache('stale_response', stale is not None)
+        if stale is None:
+            return None
+        content_type, content = stale
+        response = HttpResponse(content, content_type=content_type)
+        response['Warning'] = '110 - "Response is Stale"'
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('namespace', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Пространство имён')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'версия кеша',
+                'verbose_name_plural': 'Версии кешей',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class CacheVersion(models.Model):
+    """
+    Версия пространства имён кешей. Увеличивается при изменении данных,
+    воркеры сравнивают её со своей и сбрасывают устаревшие кеши.
+    """
+    namespace = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name='Пространство имён'
+    )
+    version = models.BigIntegerField(default=0, verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'версия кеша'
+        verbose_name_plural = 'Версии кешей'
+
+    def __str__(self):
+        return f'{self.namespace}: {self.version}'
@@ -0,0 +1,163 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Профиль текущего запроса: потоки, в которых выполняется его код
+# (пул run_db), подключаются к нему сами.
+current_profile = ContextVar('request_profile', default=None)
+
+
+class StackSampler:
+    """
+    Сэмплирующий профилировщик: с заданным интервалом снимает стеки
+    потоков из threads и копит счётчики в формате collapsed stacks,
+    который понимают flamegraph.pl и speedscope. Корень каждого стека -
+    имя потока.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.threads = set()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name
+                     for thread in threading.enumerate()}
+            for thread_id in tuple(self.threads):
+                self.sample(frames.get(thread_id),
+                            names.get(thread_id, str(thread_id)))
+
+    def sample(self, frame, thread_name):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            stack.append(
+                f'{code.co_name} ({filename}:{code.co_firstlineno})'
+            )
+            frame = frame.f_back
+        if stack:
+            stack.append(thread_name)
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class RequestProfile:
+    """
+    Профилирует обработку запроса одновременно cProfile и StackSampler
+    и сохраняет результат в каталог directory.
+
+    В профиль попадает поток, вошедший в контекст (если attach_current),
+    и каждый поток, подключённый через attached() - так run_db подключает
+    потоки пула, выполняющие код запроса. cProfile работает в каждом
+    потоке отдельно, при сохранении результаты объединяются.
+    """
+    def __init__(self, directory, sample_interval, attach_current=True):
+        self.directory = directory
+        self.attach_current = attach_current
+        self.profilers = []
+        self.lock = threading.Lock()
+        self.sampler = StackSampler(sample_interval)
+
+    def __enter__(self):
+        self.token = current_profile.set(self)
+        self.sampler.__enter__()
+        if self.attach_current:
+            self.current = self.attach_thread()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.attach_current:
+            self.detach_thread(self.current)
+        self.sampler.__exit__(*exc_info)
+        current_profile.reset(self.token)
+
+    def attach_thread(self):
+        """
+        Подключает к профилю текущий поток. Возвращает профилировщик
+        для detach_thread() или None, если поток уже подключён.
+        """
+        thread_id = threading.get_ident()
+        if thread_id in self.sampler.threads:
+            return None
+        profiler = cProfile.Profile()
+        with self.lock:
+            self.profilers.append(profiler)
+        self.sampler.threads.add(thread_id)
+        profiler.enable()
+        return profiler
+
+    def detach_thread(self, profiler):
+        if profiler is None:
+            return
+        profiler.disable()
+        self.sampler.threads.discard(threading.get_ident())
+
+    @contextmanager
+    def attached(self):
+        profiler = self.attach_thread()
+        try:
+            yield
+        finally:
+            self.detach_thread(profiler)
+
+    def stats(self):
+        """Объединённая статистика cProfile всех подключённых потоков."""
+        with self.lock:
+            profilers = list(self.profilers)
+        stats = pstats.Stats()
+        for profiler in profilers:
+            profiler.create_stats()
+            if profiler.stats:
+                stats.add(profiler)
+        return stats
+
+    def save(self, view_name, stats, duration):
+        """
+        Записывает файлы .prof (pstats), .collapsed и .json со сводкой
+        по запросу. Возвращает общее имя файлов без расширения.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = (f'{time.strftime("%Y%m%d-%H%M%S")}-{view_name}-'
+                f'{os.getpid()}-{threading.get_ident()}')
+        path = os.path.join(self.directory, name)
+        self.stats().dump_stats(f'{path}.prof')
+        with open(f'{path}.collapsed', 'w', encoding='utf-8') as f:
+            f.write(self.sampler.collapsed())
+        with open(f'{path}.json', 'w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    'view': view_name,
+                    'duration_ms': round(duration * 1000, 1),
+                    'db_queries': stats.count,
+                    'db_duplicates': stats.duplicate_count,
+                    'db_time_ms': round(stats.db_time * 1000, 1),
+                    'top_duplicates': stats.top_duplicates(5),
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        return name
@@ -0,0 +1,56 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('foodgram.replicas')
+
+# Реплика, выбранная для чтения в текущем запросе, или None.
+read_database = ContextVar('read_database', default=None)
+
+# Недоступные реплики процесса: псевдоним -> время следующей попытки.
+_unavailable = {}
+
+
+def choose_replica():
+    """
+    Возвращает псевдоним случайной доступной реплики или None, если
+    все реплики недоступны и читать нужно с основной базы.
+
+    Доступность проверяется только здесь, при подключении: если реплика
+    откажет посреди запроса, он завершится ошибкой 500.
+    """
+    now = time.monotonic()
+    replicas = [
+        alias for alias in settings.REPLICA_DATABASES
+        if _unavailable.get(alias, 0) <= now
+    ]
+    random.shuffle(replicas)
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as error:
+            _unavailable[alias] = now + settings.REPLICA_RETRY_SECONDS
+            logger.warning('Реплика %s недоступна: %s', alias, error)
+            continue
+        _unavailable.pop(alias, None)
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение на реплику, выбранную ReplicaRoutingMiddleware
+    для текущего запроса, а все записи - на основную базу.
+    """
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -25,17 +25,24 @@ INSTALLED_APPS = [
     'djoser',
     'django_filters',
 
+    'foodgram_backend.apps.FoodgramBackendConfig',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig'
 ]
 
 MIDDLEWARE = [
+    'foodgram_backend.middleware.InvalidationMiddleware',
+    'foodgram_backend.middleware.MetricsMiddleware',
+    'foodgram_backend.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram_backend.middleware.ProfilingMiddleware',
+    'foodgram_backend.middleware.RequestBudgetMiddleware',
+    'foodgram_backend.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,8 +86,51 @@ POSTGRES_DB = {
     }
 }
 
+# Режим SQLite для нескольких воркеров: WAL, ожидание блокировок вместо
+# ошибок «database is locked» и постоянные соединения.
+SQLITE_TUNING = getenv('SQLITE_TUNING', 'False') == 'True'
+SQLITE_BUSY_TIMEOUT_MS = int(getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'MEMORY',
+}
+SQLITE_BUSY_RETRIES = 5
+SQLITE_BUSY_BACKOFF = 0.05
+
+if SQLITE_TUNING:
+    SQLITE_DB['default']['ENGINE'] = 'foodgram_backend.sqlite'
+    SQLITE_DB['default']['CONN_MAX_AGE'] = int(getenv('CONN_MAX_AGE', 600))
+    SQLITE_DB['default']['OPTIONS'] = {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+
 DATABASES = POSTGRES_DB if getenv('USE_POSTGRES_DB', 'False') == 'True' else SQLITE_DB
 
+# Реплики для чтения: адреса серверов PostgreSQL или пути к файлам SQLite.
+for index, replica in enumerate(filter(None, getenv('DB_REPLICAS', '').split(', ')), start=1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST' if DATABASES is POSTGRES_DB else 'NAME': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+REPLICA_VIEWS = ('RecipeViewSet', 'IngredientViewSet', 'IngredientSearchView', 'TagViewSet', 'ShortUrlRedirectView')
+REPLICA_STICKY_COOKIE = 'primary_until'
+REPLICA_STICKY_SECONDS = int(getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_RETRY_SECONDS = int(getenv('REPLICA_RETRY_SECONDS', 30))
+
+DATABASE_ROUTERS = ['foodgram_backend.routers.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -119,7 +169,16 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -133,8 +192,76 @@ DJOSER = {
         'user': ['rest_framework.permissions.AllowAny'],
         'user_list': ['rest_framework.permissions.AllowAny']
     },
-    'HIDE_USERS': False
+    'HIDE_USERS': False,
+    'LOGOUT_ON_PASSWORD_CHANGE': True,
 }
 
+# Ограничения по представлениям (имена как в метриках):
+# timeout_ms - крайний срок запроса, max_in_flight - одновременных запросов
+# в процессе, stale_ttl - сколько секунд хранить ответ анонимным клиентам
+# на случай перегрузки.
+REQUEST_BUDGETS = {
+    'RecipeViewSet.list': {'timeout_ms': 3000, 'max_in_flight': 16, 'stale_ttl': 600},
+    'RecipeViewSet.retrieve': {'timeout_ms': 2000, 'max_in_flight': 16, 'stale_ttl': 600},
+    'UserViewSet.subscriptions': {'timeout_ms': 3000, 'max_in_flight': 4},
+    'ShoppingCartDownloadView': {'timeout_ms': 5000, 'max_in_flight': 4},
+} if getenv('REQUEST_BUDGETS_ENABLED', 'False') == 'True' else {}
+REQUEST_RETRY_AFTER = int(getenv('REQUEST_RETRY_AFTER', 5))
+SQLITE_PROGRESS_STEPS = 1000
+STATEMENT_TIMEOUT_STEP_MS = 100
+# Счётчики max_in_flight хранятся в кеше Django. С кешем в памяти процесса
+# они общие только для одного процесса, поэтому при нескольких воркерах
+# gunicorn (GUNICORN_WORKERS выставляет gunicorn.conf.py) без общего кеша
+# max_in_flight не применяется.
+REQUEST_IN_FLIGHT_TTL = int(getenv('REQUEST_IN_FLIGHT_TTL', 60))
+REQUEST_STALE_REFRESH = int(getenv('REQUEST_STALE_REFRESH', 10))
+REQUEST_STALE_KEYS = 10000
+ASGI = getenv('ASGI', 'False') == 'True'
+SERVER_WORKERS = int(getenv('GUNICORN_WORKERS', 1))
+
+INVALIDATION_BACKEND = getenv('INVALIDATION_BACKEND', 'foodgram_backend.invalidation.DatabaseBackend')
+INVALIDATION_POLL_MS = int(getenv('INVALIDATION_POLL_MS', 500))
+
+# Переходы по коротким ссылкам записываются в БД раз в
+# SHORT_URL_CLICKS_FLUSH_SECONDS секунд или после SHORT_URL_CLICKS_FLUSH_HITS
+# переходов в процессе.
+SHORT_URL_CLICKS_FLUSH_SECONDS = int(getenv('SHORT_URL_CLICKS_FLUSH_SECONDS', 10))
+SHORT_URL_CLICKS_FLUSH_HITS = int(getenv('SHORT_URL_CLICKS_FLUSH_HITS', 1000))
+
+TOKEN_CACHE_TTL = int(getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_LOCAL_TTL = int(getenv('TOKEN_CACHE_LOCAL_TTL', 5))
+TOKEN_CACHE_SIZE = 10000
+
+ASYNC_DB_THREADS = int(getenv('ASYNC_DB_THREADS', 8))
+
 PAGE_SIZE = 6
 PAGE_SIZE_QUERY_PARAM = 'limit'
+MAX_PAGE_SIZE = int(getenv('MAX_PAGE_SIZE', 100))
+STREAM_CHUNK_SIZE = 500
+
+SQL_INSTRUMENTATION = getenv('SQL_INSTRUMENTATION', 'False') == 'True'
+SQL_QUERY_BUDGET = int(getenv('SQL_QUERY_BUDGET', 50))
+SQL_LATENCY_BUDGET_MS = int(getenv('SQL_LATENCY_BUDGET_MS', 500))
+SQL_DUPLICATES_LOG_LIMIT = 5
+
+METRICS_ENABLED = getenv('METRICS_ENABLED', 'False') == 'True'
+
+PROFILING_ENABLED = getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_DIR = getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_SAMPLE_INTERVAL = 0.001
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram': {
+            'handlers': ['console'],
+            'level': getenv('FOODGRAM_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
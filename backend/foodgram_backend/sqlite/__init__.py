@@ -0,0 +1,44 @@
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """Выставляет PRAGMA из SQLITE_PRAGMAS каждому новому соединению."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def retry_on_busy(func):
+    """
+    Выполняет короткую пишущую операцию в транзакции и при ошибке
+    SQLite «database is locked» повторяет её с экспоненциальной паузой.
+
+    Внутри внешней транзакции и на других СУБД просто вызывает func.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(settings.SQLITE_BUSY_RETRIES):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if ('locked' not in str(error)
+                        or attempt == settings.SQLITE_BUSY_RETRIES - 1):
+                    raise
+                time.sleep(
+                    settings.SQLITE_BUSY_BACKOFF * 2 ** attempt
+                    * random.uniform(0.5, 1.5)
+                )
+    return wrapper
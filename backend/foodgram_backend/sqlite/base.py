@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite-бэкенд, начинающий транзакции с BEGIN IMMEDIATE.
+
+    Обычный BEGIN откладывает захват блокировки записи до первого
+    изменения, и в режиме WAL такая транзакция сразу получает
+    «database is locked», если за это время писал другой процесс.
+    BEGIN IMMEDIATE берёт блокировку в начале и ждёт её busy_timeout.
+    """
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
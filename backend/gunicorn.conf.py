@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# ASGI=True переключает сервер на воркеры uvicorn: асинхронные представления
+# обслуживаются в цикле событий, остальные - в потоках, как и раньше.
+if os.environ.get('ASGI', 'False') == 'True':
+    wsgi_app = 'foodgram_backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram_backend.wsgi:application'
+
+
+def on_starting(server):
+    """
+    Сообщает Django число воркеров и очищает файлы метрик, оставшиеся
+    от предыдущего запуска.
+    """
+    os.environ['GUNICORN_WORKERS'] = str(server.cfg.workers)
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Записывает переходы по коротким ссылкам, накопленные воркером."""
+    clicks = sys.modules.get('recipes.clicks')
+    if clicks is not None:
+        clicks.flush_on_exit()
@@ -1,13 +1,62 @@
+from django import forms
 from django.contrib import admin
-from django.db.models import Count
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Count, OuterRef, Subquery, Sum
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from foodgram_backend.admin import LargeTableAdmin
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeClick,
+                            RecipeIngredient, ShoppingCart, Tag)
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения, который подписывает выбранное значение
+    по уже загруженному объекту preloaded, а не отдельным запросом.
+    """
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [str(pk) for pk in value if pk]
+        if self.preloaded is None or selected != [str(self.preloaded.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name,
+            self.preloaded.pk,
+            self.choices.field.label_from_instance(self.preloaded),
+            True,
+            len(options),
+        ))
+        return [(None, options, 0)]
+
+
+class RecipeIngredientForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if RecipeIngredient.ingredient.is_cached(self.instance):
+            widget = self.fields['ingredient'].widget
+            getattr(widget, 'widget', widget).preloaded = (
+                self.instance.ingredient
+            )
 
 
 class RecipeIngredientInLine(admin.TabularInline):
     model = RecipeIngredient
+    form = RecipeIngredientForm
     extra = 0
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
 @admin.register(Recipe)
@@ -16,26 +65,48 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'cooking_time',
         'author',
-        'in_favorites_count'
+        'in_favorites_count',
+        'clicks_count'
     )
     search_fields = (
         'author__username',
         'name'
     )
+    readonly_fields = ('clicks_count',)
     list_filter = ('tags',)
-    filter_horizontal = ('tags',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'tags')
     inlines = (RecipeIngredientInLine,)
     empty_value_display = 'Не задано'
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        queryset = queryset.annotate(in_favorites_count=Count('favorites'))
+        if request.resolver_match.url_name == 'autocomplete':
+            # Поиск для автодополнения в админках избранного и корзины:
+            # счётчики там не показываются.
+            return queryset
+        queryset = queryset.annotate(
+            in_favorites_count=Count('favorites'),
+            # Подзапрос, а не JOIN: иначе строки переходов умножились бы
+            # на строки избранного.
+            clicks_count=Subquery(
+                RecipeClick.objects.filter(
+                    recipe=OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    total=Sum('count')
+                ).values('total')
+            ),
+        )
         return queryset
 
     @admin.decorators.display(description='В избранном')
     def in_favorites_count(self, obj):
         return obj.in_favorites_count
 
+    @admin.decorators.display(description='Переходов по ссылке')
+    def clicks_count(self, obj):
+        return getattr(obj, 'clicks_count', None) or 0
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -60,8 +131,15 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite, ShoppingCart)
-class FavoriteAndShoppingCartAdmin(admin.ModelAdmin):
+class FavoriteAndShoppingCartAdmin(LargeTableAdmin):
+    list_display = (
+        'user',
+        'recipe'
+    )
     search_fields = (
         'user__username',
         'recipe__name'
     )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
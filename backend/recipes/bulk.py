@@ -0,0 +1,44 @@
+import csv
+import io
+from itertools import islice
+
+from django.db import connection
+
+BATCH_SIZE = 5000
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_rows(model, fields, rows):
+    """
+    Быстро вставляет строки rows в таблицу модели model: на PostgreSQL
+    через COPY, на остальных СУБД пачками через executemany без создания
+    экземпляров моделей.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        for batch in batched(rows, BATCH_SIZE):
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})',
+                    batch,
+                )
@@ -0,0 +1,121 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.utils import timezone
+
+from recipes.bulk import BATCH_SIZE, batched
+from recipes.models import Recipe, RecipeClick
+
+logger = logging.getLogger('foodgram.clicks')
+
+
+def add_clicks(counts, using=DEFAULT_DB_ALIAS):
+    """
+    Прибавляет counts {(id рецепта, день): переходов} к RecipeClick
+    одним INSERT ... ON CONFLICT DO UPDATE на пачку (PostgreSQL
+    и SQLite 3.24+). Переходы удалённых рецептов отбрасываются.
+    """
+    existing = set()
+    for batch in batched({recipe_id for recipe_id, _ in counts}, BATCH_SIZE):
+        existing.update(Recipe.objects.using(using).filter(
+            id__in=batch
+        ).values_list('id', flat=True))
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(RecipeClick._meta.db_table)
+    rows = [
+        (recipe_id, connection.ops.adapt_datefield_value(day), count)
+        for (recipe_id, day), count in counts.items()
+        if recipe_id in existing
+    ]
+    with connection.cursor() as cursor:
+        for batch in batched(rows, BATCH_SIZE):
+            cursor.execute(
+                f'INSERT INTO {table} ({quote("recipe_id")}, {quote("day")}, '
+                f'{quote("count")}) VALUES '
+                + ', '.join(['(%s, %s, %s)'] * len(batch))
+                + f' ON CONFLICT ({quote("recipe_id")}, {quote("day")}) '
+                f'DO UPDATE SET {quote("count")} = {table}.{quote("count")}'
+                f' + excluded.{quote("count")}',
+                [value for row in batch for value in row],
+            )
+
+
+class ClickCounter:
+    """
+    Счётчик переходов по коротким ссылкам в памяти процесса.
+
+    hit() только увеличивает счётчик, а фоновый поток записывает
+    накопленное в БД раз в interval секунд или сразу после
+    flush_hits переходов. Остаток записывается при завершении
+    процесса; если запись не удалась, переходы возвращаются в счётчик.
+    """
+    def __init__(self, interval, flush_hits):
+        self.interval = interval
+        self.flush_hits = flush_hits
+        self.counts = Counter()
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def hit(self, recipe_id):
+        with self.lock:
+            self.counts[recipe_id, timezone.localdate()] += 1
+            self.hits += 1
+            if self.hits >= self.flush_hits:
+                self.wakeup.set()
+            # После fork поток родителя в процессе воркера не работает.
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(
+                    target=self.run, name='click-counter', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать переходы по ссылкам.')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Записывает накопленные переходы; возвращает их число."""
+        with self.flush_lock:
+            with self.lock:
+                counts, self.counts = self.counts, Counter()
+                self.hits = 0
+            if not counts:
+                return 0
+            try:
+                add_clicks(counts)
+            except Exception:
+                with self.lock:
+                    self.counts.update(counts)
+                    self.hits += sum(counts.values())
+                raise
+            return sum(counts.values())
+
+
+click_counter = ClickCounter(settings.SHORT_URL_CLICKS_FLUSH_SECONDS,
+                             settings.SHORT_URL_CLICKS_FLUSH_HITS)
+
+
+@atexit.register
+def flush_on_exit():
+    try:
+        click_counter.flush()
+    except Exception:
+        logger.exception('Не удалось записать переходы по ссылкам.')
@@ -25,3 +25,18 @@ MAX_USERNAME_LENGTH = 150
 MIN_PASSWORD_LENGTH = 8
 
 MAX_AVAILABLE_VALUE = 32767
+
+# Константы похожих рецептов
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_TAG_WEIGHT = 0.5
+
+# Константы поиска рецептов по имеющимся продуктам
+PANTRY_MAX_INGREDIENTS = 100
+PANTRY_MAX_MISSING = 10
+PANTRY_COMPACT_SIZE = 10000
+RECIPE_CHANGES_LOOKBACK = 1000
+RECIPE_CHANGES_RETENTION_HOURS = 24
+
+# Константы сводок популярности ингредиентов и тегов
+POPULARITY_DEFAULT_DAYS = 30
+POPULARITY_MAX_LIMIT = 100
@@ -0,0 +1,142 @@
+import time
+from array import array
+from operator import itemgetter
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from recipes.bulk import batched, insert_rows
+from recipes.constants import SIMILAR_RECIPES_COUNT
+from recipes.models import SimilarRecipe, SimilarRecipeQueue
+from recipes.similarity import (RecipeVectors, get_engine, load_features,
+                                load_frequencies, queued_neighbourhood)
+
+SCORE_DIGITS = 4
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий расчёт похожих рецептов по TF-IDF векторам
+    ингредиентов и тегов.
+    """
+    help = ('Пересчитывает таблицу похожих рецептов целиком или, '
+            'с --incremental, только для рецептов из очереди '
+            'на пересчёт (созданных и изменённых).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true')
+        parser.add_argument('--top-k', type=int,
+                            default=SIMILAR_RECIPES_COUNT)
+        parser.add_argument('--block-size', type=int, default=256)
+        parser.add_argument('--engine', choices=('auto', 'numpy', 'python'),
+                            default='auto')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Рецепты, попавшие в очередь во время расчёта, останутся в ней.
+        queued = list(SimilarRecipeQueue.objects.values_list(
+            'recipe_id', flat=True
+        ))
+        if options['incremental'] and not queued:
+            self.stdout.write('Очередь на пересчёт пуста.')
+            return
+        if options['incremental']:
+            # Загружаются только рецепты из очереди и рецепты с общими
+            # ингредиентами, IDF считается по всем рецептам в базе.
+            vectors = RecipeVectors(
+                load_features(queued_neighbourhood()), *load_frequencies()
+            )
+        else:
+            vectors = RecipeVectors(load_features())
+        engine = get_engine(vectors, options['block_size'], options['engine'])
+        if options['incremental']:
+            count = self.update(vectors, engine, queued, options['top_k'],
+                                options['block_size'])
+        else:
+            count = self.rebuild(vectors, engine, queued, options['top_k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {count} '
+            f'({type(engine).__name__}, '
+            f'{time.perf_counter() - started:.1f} с).'
+        ))
+
+    @staticmethod
+    def rebuild(vectors, engine, queued, top_k):
+        recipes, similar, scores = array('q'), array('q'), array('d')
+        for row, neighbours in engine.top_k(range(len(vectors.ids)), top_k):
+            for other, score in neighbours:
+                recipes.append(vectors.ids[row])
+                similar.append(vectors.ids[other])
+                scores.append(round(score, SCORE_DIGITS))
+        with transaction.atomic():
+            SimilarRecipe.objects.all().delete()
+            insert_rows(SimilarRecipe, ('recipe_id', 'similar_id', 'score'),
+                        zip(recipes, similar, scores))
+            for ids in batched(queued, 500):
+                SimilarRecipeQueue.objects.filter(recipe_id__in=ids).delete()
+        return len(vectors.ids)
+
+    def update(self, vectors, engine, queued, top_k, block_size):
+        """
+        Пересчитывает списки рецептов из очереди и добавляет их
+        в списки остальных рецептов, если они попадают в top_k.
+        """
+        count = 0
+        for block in batched(queued, block_size):
+            rows = [vectors.index[recipe_id] for recipe_id in block
+                    if recipe_id in vectors.index]
+            scores = list(engine.scores(rows))
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(
+                    Q(recipe_id__in=block) | Q(similar_id__in=block)
+                ).delete()
+                self.add_neighbours(vectors, scores, set(block), top_k)
+                SimilarRecipeQueue.objects.filter(
+                    recipe_id__in=block
+                ).delete()
+            count += len(rows)
+        return count
+
+    @staticmethod
+    def add_neighbours(vectors, scores, block, top_k):
+        lists = {
+            item['recipe_id']: (item['count'], item['lowest'])
+            for item in SimilarRecipe.objects.values('recipe_id').annotate(
+                count=Count('id'), lowest=Min('score')
+            ).order_by()
+        }
+        new_rows = []
+        extended = set()
+        for row, row_scores in scores:
+            recipe_id = vectors.ids[row]
+            ranked = sorted(row_scores.items(), key=itemgetter(1),
+                            reverse=True)
+            new_rows.extend(
+                (recipe_id, vectors.ids[other], round(score, SCORE_DIGITS))
+                for other, score in ranked[:top_k]
+            )
+            for other, score in ranked:
+                other_id = vectors.ids[other]
+                if other_id in block:
+                    continue
+                count, lowest = lists.get(other_id, (0, 0))
+                if count < top_k or score > lowest:
+                    new_rows.append(
+                        (other_id, recipe_id, round(score, SCORE_DIGITS))
+                    )
+                    extended.add(other_id)
+        insert_rows(SimilarRecipe, ('recipe_id', 'similar_id', 'score'),
+                    new_rows)
+        # Списки, в которые добавились рецепты, обрезаются до top_k.
+        surplus = []
+        for recipe_ids in batched(extended, 500):
+            kept = {}
+            for pk, recipe_id in SimilarRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by('recipe_id', '-score').values_list('id', 'recipe_id'):
+                kept[recipe_id] = kept.get(recipe_id, 0) + 1
+                if kept[recipe_id] > top_k:
+                    surplus.append(pk)
+        for pks in batched(surplus, 500):
+            SimilarRecipe.objects.filter(pk__in=pks).delete()
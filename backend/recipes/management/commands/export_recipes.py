@@ -0,0 +1,137 @@
+import base64
+import gzip
+import io
+import json
+import sys
+import tarfile
+from collections import defaultdict
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe, RecipeIngredient
+
+IMAGE_MODES = ('inline', 'tar', 'none')
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий потоковую выгрузку рецептов в JSONL:
+    по одной строке на рецепт с ингредиентами, тегами, автором
+    и изображением.
+    """
+    help = ('Выгружает рецепты в JSONL (.gz сжимается). Изображения '
+            'встраиваются в base64, пишутся в архив рядом с файлом '
+            '(<файл>.images.tar) или выгружаются только ссылками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdout.')
+        parser.add_argument('--images', choices=IMAGE_MODES,
+                            default='inline')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.images = options['images']
+        self.archived = set()
+        self.missing_images = set()
+        archive = None
+        if self.images == 'tar':
+            archive = tarfile.open(f'{options["path"]}.images.tar', 'w')
+        output = open_output(options['path'])
+        count = 0
+        try:
+            recipes = Recipe.objects.order_by('pk').values(
+                'id', 'name', 'text', 'cooking_time', 'image', 'short_url',
+                'created_at', 'author__username',
+            ).iterator(chunk_size=options['chunk_size'])
+            while True:
+                chunk = list(islice(recipes, options['chunk_size']))
+                if not chunk:
+                    break
+                for record in self.build_records(chunk, archive):
+                    output.write(json.dumps(record, ensure_ascii=False))
+                    output.write('\n')
+                count += len(chunk)
+                if output is not sys.stdout:
+                    self.stdout.write(f'Выгружено рецептов: {count}')
+        finally:
+            if output is not sys.stdout:
+                output.close()
+            if archive is not None:
+                archive.close()
+        # При выгрузке в stdout итог не должен попасть в данные.
+        report = sys.stderr if output is sys.stdout else self.stdout
+        report.write(
+            f'Выгружено рецептов: {count}, '
+            f'изображений не найдено: {len(self.missing_images)}.\n'
+        )
+
+    def build_records(self, chunk, archive):
+        """Дополняет пачку рецептов ингредиентами и тегами двумя запросами."""
+        ids = [recipe['id'] for recipe in chunk]
+        ingredients = defaultdict(list)
+        for recipe_id, name, measurement_unit, amount in (
+            RecipeIngredient.objects.filter(recipe_id__in=ids).order_by(
+                'pk'
+            ).values_list(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount',
+            )
+        ):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        tags = defaultdict(list)
+        for recipe_id, name, slug in (
+            Recipe.tags.through.objects.filter(recipe_id__in=ids).order_by(
+                'pk'
+            ).values_list('recipe_id', 'tag__name', 'tag__slug')
+        ):
+            tags[recipe_id].append({'name': name, 'slug': slug})
+
+        for recipe in chunk:
+            yield {
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'short_url': recipe['short_url'],
+                'created_at': recipe['created_at'].isoformat(),
+                'author': recipe['author__username'],
+                'image': self.export_image(recipe['image'], archive),
+                'ingredients': ingredients[recipe['id']],
+                'tags': tags[recipe['id']],
+            }
+
+    def export_image(self, name, archive):
+        """
+        Возвращает описание изображения: имя файла или, при --images
+        inline, словарь с именем и содержимым в base64.
+        """
+        if (self.images == 'none' or not name or name in self.archived
+                or name in self.missing_images):
+            return name
+        try:
+            with default_storage.open(name, 'rb') as f:
+                content = f.read()
+        except OSError:
+            self.missing_images.add(name)
+            return name
+        if self.images == 'inline':
+            return {'name': name,
+                    'data': base64.b64encode(content).decode()}
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        archive.addfile(info, io.BytesIO(content))
+        self.archived.add(name)
+        return name
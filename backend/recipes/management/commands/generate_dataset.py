@@ -0,0 +1,223 @@
+import csv
+import random
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from foodgram_backend import invalidation
+from recipes.bulk import BATCH_SIZE, insert_rows
+from recipes.constants import SHORT_URL_LENGTH, SHORT_URL_SYMBOLS
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.pantry import record_changes
+from users.models import Follow
+
+User = get_user_model()
+
+TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'),
+    ('Выпечка', 'bakery'),
+    ('Вегетарианское', 'vegetarian'),
+    ('Быстро', 'quick'),
+    ('Праздничное', 'holiday'),
+)
+WORDS = (
+    'суп', 'салат', 'пирог', 'рагу', 'запеканка', 'каша', 'паста', 'омлет',
+    'домашний', 'быстрый', 'летний', 'острый', 'сливочный', 'бабушкин',
+    'с грибами', 'с курицей', 'с сыром', 'по-итальянски', 'на гриле',
+)
+
+
+def zipf_weights(size, exponent):
+    """
+    Накопленные веса распределения Ципфа для random.choices(): немногие
+    элементы получают большую часть выборок.
+    """
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий генерацию синтетического набора данных
+    для нагрузочного тестирования.
+    """
+    help = ('Создаёт пользователей, рецепты, подписки, избранное '
+            'и списки покупок с неравномерным распределением.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Среднее число рецептов в избранном.')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Среднее число рецептов в списке покупок.')
+        parser.add_argument('--ingredients-file',
+                            default='data/ingredients.csv')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            ingredient_ids = self.load_ingredients(options['ingredients_file'])
+            tag_ids = self.create_tags()
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(options['recipes'], user_ids)
+            self.link_recipes(recipe_ids, ingredient_ids, tag_ids)
+            self.create_follows(user_ids, options['follows'])
+            for model in (Favorite, ShoppingCart):
+                self.create_user_recipe_links(
+                    model,
+                    user_ids,
+                    recipe_ids,
+                    options['cart' if model is ShoppingCart else 'favorites'],
+                )
+            # Массовая вставка обходит сигналы моделей.
+            record_changes()
+            for namespace in invalidation.NAMESPACES:
+                invalidation.publish(namespace)
+        self.stdout.write(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}.'
+        )
+
+    def load_ingredients(self, path):
+        if not Ingredient.objects.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                reader = csv.DictReader(
+                    f, fieldnames=['name', 'measurement_unit']
+                )
+                Ingredient.objects.bulk_create(
+                    (Ingredient(**row) for row in reader),
+                    batch_size=BATCH_SIZE,
+                    ignore_conflicts=True,
+                )
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    @staticmethod
+    def create_tags():
+        for name, slug in TAGS:
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        last_id = User.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        password = make_password('synthetic-password')
+        suffix = self.random.getrandbits(32)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'user_{suffix}_{index}',
+                    email=f'user_{suffix}_{index}@example.com',
+                    first_name=f'Имя{index}',
+                    last_name=f'Фамилия{index}',
+                    password=password,
+                )
+                for index in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return list(User.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', flat=True))
+
+    def generate_short_urls(self, count):
+        existing = set(Recipe.objects.values_list('short_url', flat=True))
+        urls = set()
+        while len(urls) < count:
+            url = ''.join(self.random.choices(SHORT_URL_SYMBOLS,
+                                              k=SHORT_URL_LENGTH))
+            if url not in existing:
+                urls.add(url)
+        return list(urls)
+
+    def create_recipes(self, count, user_ids):
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        authors = self.random.choices(
+            user_ids, cum_weights=zipf_weights(len(user_ids), 1.1), k=count
+        )
+        short_urls = self.generate_short_urls(count)
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=' '.join(self.random.sample(WORDS, 3)).capitalize(),
+                    text=' '.join(self.random.choices(WORDS, k=60)),
+                    cooking_time=self.random.randint(5, 180),
+                    image='recipes/images/synthetic.png',
+                    author_id=author_id,
+                    short_url=short_url,
+                )
+                for author_id, short_url in zip(authors, short_urls)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return list(Recipe.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', flat=True))
+
+    def link_recipes(self, recipe_ids, ingredient_ids, tag_ids):
+        ingredient_weights = zipf_weights(len(ingredient_ids), 0.9)
+        self.random.shuffle(ingredient_ids)
+
+        def recipe_ingredients():
+            for recipe_id in recipe_ids:
+                chosen = set(self.random.choices(
+                    ingredient_ids,
+                    cum_weights=ingredient_weights,
+                    k=self.random.randint(3, 12),
+                ))
+                for ingredient_id in chosen:
+                    yield (recipe_id, ingredient_id,
+                           self.random.randint(1, 500))
+
+        def recipe_tags():
+            for recipe_id in recipe_ids:
+                for tag_id in self.random.sample(
+                        tag_ids, self.random.randint(1, 3)):
+                    yield recipe_id, tag_id
+
+        insert_rows(RecipeIngredient,
+                    ('recipe_id', 'ingredient_id', 'amount'),
+                    recipe_ingredients())
+        insert_rows(Recipe.tags.through, ('recipe_id', 'tag_id'),
+                    recipe_tags())
+
+    def skewed_links(self, owner_ids, target_ids, mean, exclude_self=False):
+        """
+        Для каждого владельца выбирает случайное число целей со средним
+        mean: популярные цели встречаются заметно чаще остальных.
+        """
+        weights = zipf_weights(len(target_ids), 1.0)
+        for owner_id in owner_ids:
+            size = min(int(self.random.expovariate(1 / mean)),
+                       len(target_ids))
+            chosen = set(self.random.choices(
+                target_ids, cum_weights=weights, k=size
+            ))
+            if exclude_self:
+                chosen.discard(owner_id)
+            for target_id in chosen:
+                yield owner_id, target_id
+
+    def create_follows(self, user_ids, mean):
+        popular = self.random.sample(user_ids, len(user_ids))
+        insert_rows(Follow, ('user_id', 'following_id'),
+                    self.skewed_links(user_ids, popular, mean,
+                                      exclude_self=True))
+
+    def create_user_recipe_links(self, model, user_ids, recipe_ids, mean):
+        popular = self.random.sample(recipe_ids, len(recipe_ids))
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        insert_rows(model, ('user_id', 'recipe_id', 'created_at'),
+                    (link + (created_at,) for link in self.skewed_links(
+                        user_ids, popular, mean)))
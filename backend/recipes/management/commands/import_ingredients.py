@@ -1,15 +1,173 @@
 import csv
+import gzip
+import io
+import json
+from itertools import islice
+from pathlib import Path
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from foodgram_backend import invalidation
+from recipes.constants import (MAX_INGREDIENT_MEASUREMENT_UNIT_LENGTH,
+                               MAX_INGREDIENT_NAME_LENGTH)
 from recipes.models import Ingredient
 
+FIELDS = ('name', 'measurement_unit')
+FORMATS = ('csv', 'jsonl')
+STAGING_TABLE = 'ingredient_import'
+
+
+def read_rows(path, file_format):
+    """Построчно читает файл CSV или JSONL, в том числе сжатый gzip."""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if file_format == 'jsonl':
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row.get('name'), row.get('measurement_unit')
+            return
+        for row in csv.reader(f):
+            if row and tuple(row[:2]) != FIELDS:
+                yield tuple(row[:2]) if len(row) > 1 else (row[0], None)
+
+
+def clean_row(row):
+    """Возвращает очищенную пару (название, единица) или None."""
+    name, measurement_unit = (
+        value.strip() if isinstance(value, str) else '' for value in row
+    )
+    if (not name or not measurement_unit
+            or len(name) > MAX_INGREDIENT_NAME_LENGTH
+            or len(measurement_unit) > MAX_INGREDIENT_MEASUREMENT_UNIT_LENGTH):
+        return None
+    return name, measurement_unit
+
 
 class Command(BaseCommand):
-    """Класс, реализующий загрузку информации в базу данных из файла."""
+    """
+    Класс, реализующий потоковую загрузку ингредиентов из файла:
+    строки пачками попадают во временную таблицу и переносятся
+    в таблицу ингредиентов без дубликатов.
+    """
+    help = ('Загружает ингредиенты из CSV или JSONL (в том числе .gz). '
+            'Повторный запуск не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='data/ingredients.csv')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--update', action='store_true',
+                            help='Обновлять единицу измерения ингредиента '
+                                 'с тем же названием.')
+
     def handle(self, *args, **options):
-        with open('data/ingredients.csv', 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f, fieldnames=['name', 'measurement_unit'])
-            ingredients = [Ingredient(**row) for row in reader]
-            Ingredient.objects.bulk_create(ingredients, ignore_conflicts=True)
-            self.stdout.write('Успешно загружено!')
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        file_format = options['format'] or self.detect_format(path)
+        rows = read_rows(path, file_format)
+        counts = dict.fromkeys(
+            ('read', 'invalid', 'inserted', 'updated', 'skipped'), 0
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {STAGING_TABLE} ('
+                f'name varchar({MAX_INGREDIENT_NAME_LENGTH}), '
+                f'measurement_unit '
+                f'varchar({MAX_INGREDIENT_MEASUREMENT_UNIT_LENGTH}))'
+            )
+            cursor.execute(f'CREATE INDEX {STAGING_TABLE}_name '
+                           f'ON {STAGING_TABLE} (name)')
+            try:
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    cleaned = [
+                        row for row in map(clean_row, batch)
+                        if row is not None
+                    ]
+                    counts['read'] += len(batch)
+                    counts['invalid'] += len(batch) - len(cleaned)
+                    with transaction.atomic():
+                        inserted, updated = self.import_batch(
+                            cursor, cleaned, options['update']
+                        )
+                    counts['inserted'] += inserted
+                    counts['updated'] += updated
+                    counts['skipped'] += len(cleaned) - inserted - updated
+                    self.stdout.write(f'Обработано строк: {counts["read"]}')
+            finally:
+                cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+        invalidation.publish(invalidation.INGREDIENTS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {counts["read"]}, добавлено: {counts["inserted"]}, '
+            f'обновлено: {counts["updated"]}, '
+            f'пропущено: {counts["skipped"]}, '
+            f'с ошибками: {counts["invalid"]}.'
+        ))
+
+    @staticmethod
+    def detect_format(path):
+        suffixes = path.suffixes[-2:] if path.suffix == '.gz' else [
+            path.suffix
+        ]
+        file_format = suffixes[0].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError('Не удалось определить формат файла, '
+                               'укажите --format.')
+        return file_format
+
+    @staticmethod
+    def import_batch(cursor, rows, update):
+        """
+        Переносит пачку строк через временную таблицу: на PostgreSQL
+        загружает её через COPY, на остальных СУБД - executemany.
+        Возвращает число добавленных и обновлённых ингредиентов.
+        """
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        cursor.execute(f'DELETE FROM {STAGING_TABLE}')
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                f'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {STAGING_TABLE} (name, measurement_unit) '
+                f'VALUES (%s, %s)',
+                rows,
+            )
+        updated = 0
+        if update:
+            # Меняется единица только у однозначных названий: одна строка
+            # в таблице и одна единица измерения в файле. Строки таблицы
+            # с тем же названием считаются по индексу только для названий
+            # из пачки, а не группировкой всей таблицы.
+            cursor.execute(
+                f'UPDATE {table} SET measurement_unit = ('
+                f'SELECT MAX(s.measurement_unit) FROM {STAGING_TABLE} s '
+                f'WHERE s.name = {table}.name) '
+                f'WHERE name IN ('
+                f'SELECT name FROM {STAGING_TABLE} GROUP BY name '
+                f'HAVING COUNT(DISTINCT measurement_unit) = 1) '
+                f'AND (SELECT COUNT(*) FROM {table} t '
+                f'WHERE t.name = {table}.name) = 1 '
+                f'AND NOT EXISTS ('
+                f'SELECT 1 FROM {STAGING_TABLE} s WHERE s.name = {table}.name '
+                f'AND s.measurement_unit = {table}.measurement_unit)'
+            )
+            updated = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            f'SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} '
+            f'WHERE TRUE ON CONFLICT (name, measurement_unit) DO NOTHING'
+        )
+        return cursor.rowcount, updated
@@ -0,0 +1,235 @@
+import base64
+import gzip
+import json
+import sys
+import tarfile
+from hashlib import sha256
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from foodgram_backend import invalidation
+from recipes.bulk import batched, insert_rows
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            SimilarRecipeQueue, Tag)
+from recipes.pantry import record_changes
+
+User = get_user_model()
+
+
+def read_records(path):
+    if path == '-':
+        source = sys.stdin
+    elif path.endswith('.gz'):
+        source = gzip.open(path, 'rt', encoding='utf-8')
+    else:
+        source = open(path, encoding='utf-8')
+    with source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий потоковую загрузку рецептов из JSONL,
+    созданного командой export_recipes.
+    """
+    help = ('Загружает рецепты из JSONL пачками. Рецепты с уже '
+            'существующей короткой ссылкой пропускаются, поэтому '
+            'повторная загрузка не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--images-tar',
+                            help='Архив изображений, по умолчанию '
+                                 '<файл>.images.tar, если он есть.')
+        parser.add_argument('--default-author',
+                            help='Автор рецептов, чьих авторов нет в базе.')
+
+    def handle(self, *args, **options):
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.default_author = None
+        if options['default_author']:
+            self.default_author = self.authors.get(options['default_author'])
+            if self.default_author is None:
+                raise CommandError(
+                    f'Пользователь {options["default_author"]} не найден.'
+                )
+        self.archive = self.open_archive(options['path'],
+                                         options['images_tar'])
+        self.counts = dict.fromkeys(
+            ('read', 'created', 'existing', 'no_author'), 0
+        )
+        # Одинаковые встроенные изображения сохраняются один раз.
+        self.saved_images = {}
+        records = read_records(options['path'])
+        try:
+            for batch in batched(records, options['batch_size']):
+                with transaction.atomic():
+                    self.import_batch(batch)
+                self.stdout.write(
+                    f'Обработано рецептов: {self.counts["read"]}'
+                )
+        finally:
+            if self.archive is not None:
+                self.archive.close()
+        if self.counts['created']:
+            # Рецептов много, поэтому индексы перестраиваются целиком.
+            record_changes()
+        for namespace in (invalidation.RECIPES, invalidation.INGREDIENTS,
+                          invalidation.TAGS):
+            invalidation.publish(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {self.counts["read"]}, '
+            f'создано: {self.counts["created"]}, '
+            f'уже были: {self.counts["existing"]}, '
+            f'без автора: {self.counts["no_author"]}.'
+        ))
+
+    @staticmethod
+    def open_archive(path, images_tar):
+        if images_tar is None and path != '-':
+            candidate = Path(f'{path}.images.tar')
+            images_tar = candidate if candidate.exists() else None
+        return tarfile.open(images_tar) if images_tar else None
+
+    def import_batch(self, batch):
+        self.counts['read'] += len(batch)
+        existing = set(Recipe.objects.filter(
+            short_url__in=[record['short_url'] for record in batch]
+        ).values_list('short_url', flat=True))
+        records = []
+        for record in batch:
+            if record['short_url'] in existing:
+                self.counts['existing'] += 1
+                continue
+            author_id = self.authors.get(record['author'],
+                                         self.default_author)
+            if author_id is None:
+                self.counts['no_author'] += 1
+                continue
+            existing.add(record['short_url'])
+            record['author_id'] = author_id
+            records.append(record)
+        if not records:
+            return
+        self.resolve_references(records)
+
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=self.import_image(record['image']),
+                author_id=record['author_id'],
+                short_url=record['short_url'],
+            )
+            for record in records
+        )
+        recipe_ids = dict(Recipe.objects.filter(
+            short_url__in=[record['short_url'] for record in records]
+        ).values_list('short_url', 'id'))
+        # auto_now_add заменил дату создания при вставке, поэтому она
+        # восстанавливается отдельным UPDATE.
+        Recipe.objects.bulk_update(
+            (
+                Recipe(id=recipe_ids[record['short_url']],
+                       created_at=parse_datetime(record['created_at']))
+                for record in records
+            ),
+            ('created_at',),
+            batch_size=500,
+        )
+        # Связей в несколько раз больше, чем рецептов, поэтому они
+        # вставляются без создания экземпляров моделей.
+        insert_rows(
+            RecipeIngredient,
+            ('recipe_id', 'ingredient_id', 'amount'),
+            (
+                (recipe_ids[record['short_url']],
+                 self.ingredients[ingredient['name'],
+                                  ingredient['measurement_unit']],
+                 ingredient['amount'])
+                for record in records
+                for ingredient in record['ingredients']
+            ),
+        )
+        insert_rows(
+            Recipe.tags.through,
+            ('recipe_id', 'tag_id'),
+            (
+                (recipe_ids[record['short_url']], self.tags[tag['slug']])
+                for record in records
+                for tag in record['tags']
+            ),
+        )
+        SimilarRecipeQueue.objects.bulk_create(
+            (SimilarRecipeQueue(recipe_id=recipe_id)
+             for recipe_id in recipe_ids.values()),
+            ignore_conflicts=True,
+        )
+        self.counts['created'] += len(records)
+
+    def resolve_references(self, records):
+        """Создаёт ингредиенты и теги, которых ещё нет в базе."""
+        new_ingredients = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for record in records
+            for ingredient in record['ingredients']
+        } - self.ingredients.keys()
+        if new_ingredients:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in new_ingredients),
+                ignore_conflicts=True,
+            )
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in={name for name, _ in new_ingredients}
+            ).values_list('id', 'name', 'measurement_unit'):
+                self.ingredients[name, measurement_unit] = pk
+        new_tags = {
+            tag['slug']: tag['name']
+            for record in records
+            for tag in record['tags']
+            if tag['slug'] not in self.tags
+        }
+        for slug, name in new_tags.items():
+            self.tags[slug] = Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name}
+            )[0].id
+
+    def import_image(self, image):
+        """
+        Сохраняет встроенное или взятое из архива изображение
+        и возвращает имя файла в хранилище.
+        """
+        if isinstance(image, dict):
+            content = base64.b64decode(image['data'])
+            digest = sha256(content).hexdigest()
+            if digest not in self.saved_images:
+                self.saved_images[digest] = default_storage.save(
+                    image['name'], ContentFile(content)
+                )
+            return self.saved_images[digest]
+        if self.archive is not None and image:
+            try:
+                member = self.archive.extractfile(image)
+            except KeyError:
+                return image
+            if member is not None and not default_storage.exists(image):
+                return default_storage.save(image, ContentFile(member.read()))
+        return image
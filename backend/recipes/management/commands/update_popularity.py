@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.popularity import SOURCES, catch_up, reset
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий пополнение дневных сводок популярности
+    ингредиентов и тегов.
+    """
+    help = ('Учитывает в сводках популярности рецепты, избранное и списки '
+            'покупок, добавленные после прошлого запуска. Повторный запуск '
+            'безопасен. С --rebuild сводки пересчитываются с начала.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset()
+        for source in SOURCES:
+            started = time.perf_counter()
+            count = catch_up(source, options['batch_size'])
+            self.stdout.write(f'{source}: учтено строк {count} '
+                              f'({time.perf_counter() - started:.1f} с).')
+        self.stdout.write(self.style.SUCCESS('Сводки обновлены.'))
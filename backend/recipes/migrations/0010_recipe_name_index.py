@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipeingredient_ingredient_recipe_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(db_index=True, help_text='Максимальное кол-во символов: 256.', max_length=256, verbose_name='Название'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_created_at(apps, schema_editor):
+    """
+    Существующим строкам избранного и списка покупок ставит дату
+    создания рецепта, а не дату миграции: добавлены они не раньше.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipe_created_at = models.Subquery(Recipe.objects.filter(
+        pk=models.OuterRef('recipe_id')
+    ).values('created_at')[:1])
+    for name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', name).objects.using(
+            schema_editor.connection.alias
+        ).update(created_at=recipe_created_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityWatermark',
+            fields=[
+                ('source', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Источник')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний учтённый id')),
+            ],
+            options={
+                'verbose_name': 'отметка сводок популярности',
+                'verbose_name_plural': 'Отметки сводок популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата добавления'),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='TagPopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='В избранное')),
+                ('shopping_carts', models.PositiveIntegerField(default=0, verbose_name='В список покупок')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='popularity', to='recipes.tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'популярность тега',
+                'verbose_name_plural': 'Популярность тегов',
+                'ordering': ('-day',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientPopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='В избранное')),
+                ('shopping_carts', models.PositiveIntegerField(default=0, verbose_name='В список покупок')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='popularity', to='recipes.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'популярность ингредиента',
+                'verbose_name_plural': 'Популярность ингредиентов',
+                'ordering': ('-day',),
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tagpopularity',
+            constraint=models.UniqueConstraint(fields=('tag', 'day'), name='unique_tag_day'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientpopularity',
+            index=models.Index(fields=['day'], name='ingredientpopularity_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientpopularity',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'day'), name='unique_ingredient_day'),
+        ),
+    ]
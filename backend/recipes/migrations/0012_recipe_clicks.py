@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeClick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Переходов')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clicks', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'переходы по короткой ссылке',
+                'verbose_name_plural': 'Переходы по коротким ссылкам',
+                'ordering': ('-day',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeclick',
+            constraint=models.UniqueConstraint(fields=('recipe', 'day'), name='unique_recipe_click_day'),
+        ),
+    ]
@@ -3,6 +3,7 @@ import random
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from recipes.constants import (
     MAX_AVAILABLE_VALUE, MAX_INGREDIENT_NAME_LENGTH,
@@ -92,7 +93,8 @@ class Recipe(models.Model):
     name = models.CharField(
         max_length=MAX_RECIPE_NAME_LENGTH,
         help_text=f'Максимальное кол-во символов: {MAX_RECIPE_NAME_LENGTH}.',
-        verbose_name='Название'
+        verbose_name='Название',
+        db_index=True
     )
     text = models.TextField('Описание')
     cooking_time = models.PositiveSmallIntegerField(
@@ -174,9 +176,21 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            # Для фильтров рецептов по ингредиентам: id рецептов
+            # читаются из индекса без обращения к таблице.
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipeingredient_ingr_recipe'
+            )
+        ]
 
     def __str__(self):
-        return self.ingredient.name
+        # Ингредиент не загружается ради названия, иначе вывод
+        # списка связей делает запрос на каждую строку.
+        if RecipeIngredient.ingredient.is_cached(self):
+            return self.ingredient.name
+        return f'Ингредиент {self.ingredient_id}'
 
 
 class FavoriteAndShoppingCartModel(models.Model):
@@ -191,6 +205,7 @@ class FavoriteAndShoppingCartModel(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField('Дата добавления', default=timezone.now)
 
     class Meta:
         abstract = True
@@ -220,3 +235,182 @@ class ShoppingCart(FavoriteAndShoppingCartModel):
         verbose_name = 'список покупок'
         verbose_name_plural = 'Список покупок'
         default_related_name = 'shopping_cart'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Заранее вычисленный похожий рецепт (см. команду build_similar_recipes).
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_recipe_similar'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} - {self.similar}'
+
+
+class SimilarRecipeQueue(models.Model):
+    """Рецепты, похожие рецепты которых нужно пересчитать."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        verbose_name = 'рецепт для пересчёта похожих'
+        verbose_name_plural = 'Рецепты для пересчёта похожих'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class RecipeChange(models.Model):
+    """
+    Журнал изменений рецептов, по которому процессы обновляют
+    свои индексы в памяти. Пустой recipe_id требует полной перестройки.
+    """
+    recipe_id = models.BigIntegerField('ID рецепта', null=True, blank=True)
+    created_at = models.DateTimeField('Дата изменения', auto_now_add=True,
+                                      db_index=True)
+
+    class Meta:
+        verbose_name = 'изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id or "Все рецепты"}: {self.created_at}'
+
+
+class PopularityModel(models.Model):
+    """
+    Абстрактная модель дневной сводки популярности: число рецептов,
+    созданных за день, и добавлений рецептов в избранное и в список
+    покупок за день. Заполняется командой update_popularity.
+    """
+    day = models.DateField('День')
+    recipes = models.PositiveIntegerField('Рецептов', default=0)
+    favorites = models.PositiveIntegerField('В избранное', default=0)
+    shopping_carts = models.PositiveIntegerField('В список покупок',
+                                                 default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ('-day',)
+
+
+class IngredientPopularity(PopularityModel):
+    """Дневная сводка популярности ингредиента."""
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='popularity',
+        verbose_name='Ингредиент'
+    )
+
+    class Meta(PopularityModel.Meta):
+        verbose_name = 'популярность ингредиента'
+        verbose_name_plural = 'Популярность ингредиентов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingredient', 'day'],
+                name='unique_ingredient_day'
+            )
+        ]
+        indexes = [
+            # Для выборки самых популярных ингредиентов за период.
+            models.Index(fields=['day'], name='ingredientpopularity_day')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient_id}: {self.day}'
+
+
+class TagPopularity(PopularityModel):
+    """Дневная сводка популярности тега."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='popularity',
+        verbose_name='Тег'
+    )
+
+    class Meta(PopularityModel.Meta):
+        verbose_name = 'популярность тега'
+        verbose_name_plural = 'Популярность тегов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'day'],
+                name='unique_tag_day'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.day}'
+
+
+class PopularityWatermark(models.Model):
+    """
+    Наибольший id строк источника (рецептов, избранного, списков
+    покупок), уже учтённых в сводках популярности.
+    """
+    source = models.CharField('Источник', max_length=32, primary_key=True)
+    last_id = models.BigIntegerField('Последний учтённый id', default=0)
+
+    class Meta:
+        verbose_name = 'отметка сводок популярности'
+        verbose_name_plural = 'Отметки сводок популярности'
+
+    def __str__(self):
+        return f'{self.source}: {self.last_id}'
+
+
+class RecipeClick(models.Model):
+    """
+    Переходы по короткой ссылке рецепта за день. Воркеры копят
+    переходы в памяти и периодически прибавляют их одним запросом.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='clicks',
+        verbose_name='Рецепт'
+    )
+    day = models.DateField('День')
+    count = models.PositiveIntegerField('Переходов', default=0)
+
+    class Meta:
+        verbose_name = 'переходы по короткой ссылке'
+        verbose_name_plural = 'Переходы по коротким ссылкам'
+        ordering = ('-day',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'day'],
+                name='unique_recipe_click_day'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.day}'
@@ -0,0 +1,293 @@
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from foodgram_backend import invalidation
+from recipes.bulk import batched
+from recipes.constants import (PANTRY_COMPACT_SIZE, RECIPE_CHANGES_LOOKBACK,
+                               RECIPE_CHANGES_RETENTION_HOURS)
+from recipes.models import RecipeChange, RecipeIngredient
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+READ_CHUNK_SIZE = 10000
+PRUNE_INTERVAL = 3600
+
+
+def record_changes(recipe_ids=None, using=DEFAULT_DB_ALIAS):
+    """
+    Записывает изменение рецептов в журнал. Без recipe_ids - требование
+    перестроить индексы целиком (после массовой загрузки).
+    """
+    RecipeChange.objects.using(using).bulk_create(
+        [RecipeChange()] if recipe_ids is None
+        else [RecipeChange(recipe_id=pk) for pk in recipe_ids]
+    )
+
+
+def search_database(ingredient_ids, max_missing):
+    """
+    Тот же поиск группировкой RecipeIngredient в БД: запасной вариант
+    без NumPy. Возвращает queryset пар (id рецепта, недостающих).
+    """
+    return RecipeIngredient.objects.values('recipe_id').annotate(
+        coverage=Count('ingredient_id', distinct=True,
+                       filter=Q(ingredient_id__in=ingredient_ids)),
+        missing=Count('ingredient_id', distinct=True) - F('coverage'),
+    ).filter(coverage__gt=0, missing__lte=max_missing).order_by(
+        'missing', '-coverage', '-recipe_id'
+    ).values_list('recipe_id', 'missing')
+
+
+class PantryMatches:
+    """Найденные рецепты в порядке выдачи: (id рецепта, недостающих)."""
+    def __init__(self, ids, missing):
+        self.ids = ids
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(self.ids[index].tolist(),
+                            self.missing[index].tolist()))
+        return int(self.ids[index]), int(self.missing[index])
+
+
+class PantryState:
+    """
+    Неизменяемый снимок индекса: отсортированные id рецептов, число
+    их ингредиентов и номера рецептов по каждому ингредиенту.
+
+    Рецепты, изменённые после построения снимка, исключаются из этих
+    массивов (masked) и хранятся отдельно в overlay
+    {id рецепта: frozenset(id ингредиентов)}.
+    """
+    def __init__(self, ids, sizes, postings, masked=None, overlay=None):
+        self.ids = ids
+        self.sizes = sizes
+        self.postings = postings
+        self.masked = (np.zeros(len(ids), dtype=bool)
+                       if masked is None else masked)
+        self.overlay = overlay or {}
+
+    @classmethod
+    def build(cls, recipes, ingredients):
+        """Строит снимок из массивов id рецептов и ингредиентов связей."""
+        order = np.lexsort((recipes, ingredients))
+        recipes, ingredients = recipes[order], ingredients[order]
+        unique = np.ones(len(order), dtype=bool)
+        unique[1:] = ((recipes[1:] != recipes[:-1])
+                      | (ingredients[1:] != ingredients[:-1]))
+        recipes, ingredients = recipes[unique], ingredients[unique]
+        ids, rows = np.unique(recipes, return_inverse=True)
+        sizes = np.bincount(rows, minlength=len(ids))
+        keys, starts = np.unique(ingredients, return_index=True)
+        postings = dict(zip(
+            keys.tolist(), np.split(rows.astype(np.int32), starts[1:])
+        ))
+        return cls(ids, sizes, postings)
+
+    def with_changes(self, changed):
+        """Возвращает снимок, в котором рецепты changed заменены."""
+        recipe_ids = np.fromiter(changed, dtype=np.int64, count=len(changed))
+        rows = np.searchsorted(self.ids, recipe_ids)
+        found = rows < len(self.ids)
+        found[found] = self.ids[rows[found]] == recipe_ids[found]
+        masked = self.masked.copy()
+        masked[rows[found]] = True
+        return PantryState(self.ids, self.sizes, self.postings, masked,
+                           {**self.overlay, **changed})
+
+    def compact(self):
+        """Переносит overlay в основные массивы без обращения к БД."""
+        rows = np.concatenate(
+            list(self.postings.values()) or [np.empty(0, dtype=np.int32)]
+        )
+        ingredients = np.repeat(
+            np.fromiter(self.postings, dtype=np.int64),
+            [len(posting) for posting in self.postings.values()],
+        )
+        keep = ~self.masked[rows]
+        extra = [
+            (recipe_id, ingredient_id)
+            for recipe_id, recipe_ingredients in self.overlay.items()
+            for ingredient_id in recipe_ingredients
+        ]
+        extra = np.array(extra, dtype=np.int64).reshape(-1, 2)
+        return self.build(
+            np.concatenate((self.ids[rows[keep]], extra[:, 0])),
+            np.concatenate((ingredients[keep], extra[:, 1])),
+        )
+
+    def matches(self, pantry, max_missing):
+        postings = [self.postings[pk] for pk in pantry if pk in self.postings]
+        coverage = np.bincount(
+            np.concatenate(postings or [np.empty(0, dtype=np.int32)]),
+            minlength=len(self.ids),
+        )
+        missing = self.sizes - coverage
+        rows = np.flatnonzero(
+            (coverage > 0) & (missing <= max_missing) & ~self.masked
+        )
+        ids, missing, coverage = self.ids[rows], missing[rows], coverage[rows]
+        extra = []
+        for recipe_id, recipe_ingredients in self.overlay.items():
+            covered = len(recipe_ingredients & pantry)
+            lacking = len(recipe_ingredients) - covered
+            if covered and lacking <= max_missing:
+                extra.append((recipe_id, lacking, covered))
+        if extra:
+            extra = np.array(extra, dtype=np.int64)
+            ids = np.concatenate((ids, extra[:, 0]))
+            missing = np.concatenate((missing, extra[:, 1]))
+            coverage = np.concatenate((coverage, extra[:, 2]))
+        order = np.lexsort((-ids, -coverage, missing))
+        return PantryMatches(ids[order], missing[order])
+
+
+class PantryIndex:
+    """
+    Индекс процесса для поиска рецептов по имеющимся продуктам.
+
+    Полностью строится при первом запросе, а затем обновляется
+    по журналу RecipeChange только для изменённых рецептов: после
+    события RECIPES шины инвалидации первый запрос дочитывает журнал,
+    остальные в это время пользуются прежним снимком.
+    """
+    def __init__(self):
+        self.state = None
+        self.expired = True
+        self.lock = threading.Lock()
+        self.change_from = 0
+        self.seen = set()
+        self.synced_at = 0
+        self.next_prune = 0
+
+    def expire(self):
+        self.expired = True
+
+    def search(self, ingredient_ids, max_missing):
+        self.refresh()
+        return self.state.matches(frozenset(ingredient_ids), max_missing)
+
+    def refresh(self):
+        if self.state is not None and not self.expired:
+            return
+        if not self.lock.acquire(blocking=self.state is None):
+            return
+        try:
+            if self.state is None or self.expired:
+                self.expired = False
+                try:
+                    self.sync()
+                except Exception:
+                    self.expired = True
+                    raise
+        finally:
+            self.lock.release()
+
+    def sync(self):
+        now = time.monotonic()
+        if now >= self.next_prune:
+            self.next_prune = now + PRUNE_INTERVAL
+            RecipeChange.objects.using(DEFAULT_DB_ALIAS).filter(
+                created_at__lt=timezone.now() - timedelta(
+                    hours=RECIPE_CHANGES_RETENTION_HOURS
+                )
+            ).delete()
+        # Записи журнала старше срока хранения могли быть удалены.
+        stale = (now - self.synced_at
+                 > RECIPE_CHANGES_RETENTION_HOURS * 3600 / 2)
+        if self.state is None or stale:
+            self.load()
+            return
+        changes = self.read_changes()
+        if not changes:
+            return
+        if None in changes:
+            self.load()
+            return
+        state = self.state.with_changes(self.read_recipes(changes))
+        if len(state.overlay) > PANTRY_COMPACT_SIZE:
+            state = state.compact()
+        self.state = state
+
+    def read_changes(self):
+        """
+        Возвращает id рецептов из ещё не прочитанных записей журнала.
+        Последние записи перечитываются: транзакция с меньшим id могла
+        зафиксироваться позже уже прочитанных.
+        """
+        rows = list(RecipeChange.objects.using(DEFAULT_DB_ALIAS).filter(
+            id__gt=self.change_from
+        ).order_by('id').values_list('id', 'recipe_id'))
+        changes = {recipe_id for pk, recipe_id in rows if pk not in self.seen}
+        if rows:
+            self.change_from = max(self.change_from,
+                                   rows[-1][0] - RECIPE_CHANGES_LOOKBACK)
+        self.seen = {pk for pk, _ in rows if pk > self.change_from}
+        self.synced_at = time.monotonic()
+        return changes
+
+    def load(self):
+        self.change_from = max(
+            (RecipeChange.objects.using(DEFAULT_DB_ALIAS).aggregate(
+                last=Max('id')
+            )['last'] or 0) - RECIPE_CHANGES_LOOKBACK,
+            0,
+        )
+        self.seen = set()
+        self.read_changes()
+        recipes, ingredients = array('q'), array('q')
+        for recipe_id, ingredient_id in RecipeIngredient.objects.using(
+            DEFAULT_DB_ALIAS
+        ).order_by().values_list('recipe_id', 'ingredient_id').iterator(
+            chunk_size=READ_CHUNK_SIZE
+        ):
+            recipes.append(recipe_id)
+            ingredients.append(ingredient_id)
+        self.state = PantryState.build(
+            np.frombuffer(recipes, dtype=np.int64),
+            np.frombuffer(ingredients, dtype=np.int64),
+        )
+
+    @staticmethod
+    def read_recipes(recipe_ids):
+        """Текущие ингредиенты рецептов; удалённым - пустое множество."""
+        ingredients = {recipe_id: set() for recipe_id in recipe_ids}
+        for batch in batched(recipe_ids, 500):
+            for recipe_id, ingredient_id in RecipeIngredient.objects.using(
+                DEFAULT_DB_ALIAS
+            ).filter(recipe_id__in=batch).values_list(
+                'recipe_id', 'ingredient_id'
+            ):
+                ingredients[recipe_id].add(ingredient_id)
+        return {
+            recipe_id: frozenset(recipe_ingredients)
+            for recipe_id, recipe_ingredients in ingredients.items()
+        }
+
+
+pantry_index = PantryIndex()
+invalidation.subscribe(invalidation.RECIPES, pantry_index.expire)
+
+
+def search_recipes(ingredient_ids, max_missing):
+    """
+    Рецепты, для которых из ingredient_ids есть хотя бы один ингредиент
+    и не хватает не более max_missing: сначала с меньшим числом
+    недостающих, затем с большим числом имеющихся, затем новые.
+    """
+    if np is None:
+        return search_database(ingredient_ids, max_missing)
+    return pantry_index.search(ingredient_ids, max_missing)
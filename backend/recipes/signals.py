@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram_backend.invalidation import (INGREDIENTS, RECIPES, TAGS,
+                                           invalidate_on_change)
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            SimilarRecipeQueue, Tag)
+from recipes.pantry import record_changes
+
+invalidate_on_change(TAGS, Tag)
+invalidate_on_change(INGREDIENTS, Ingredient)
+invalidate_on_change(RECIPES, Recipe, RecipeIngredient, Recipe.tags.through)
+
+
+@receiver(post_save, sender=Recipe)
+def queue_similar_recipes(sender, instance, **kwargs):
+    """Ставит созданный или изменённый рецепт в очередь на пересчёт."""
+    SimilarRecipeQueue.objects.bulk_create(
+        [SimilarRecipeQueue(recipe_id=instance.pk)], ignore_conflicts=True
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def record_recipe_change(sender, instance, using, **kwargs):
+    """Записывает изменение рецепта в журнал для индексов процессов."""
+    record_changes([instance.pk], using)
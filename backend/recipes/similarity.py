@@ -0,0 +1,207 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from recipes.bulk import batched
+from recipes.constants import SIMILAR_RECIPES_TAG_WEIGHT
+from django.db.models import Count, Q
+
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipeQueue
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+READ_CHUNK_SIZE = 10000
+
+
+def load_features(recipes=None):
+    """
+    Возвращает признаки рецептов {id рецепта: {признак: вес}}.
+    Признаки ингредиентов - их id с весом 1, признаки тегов -
+    отрицательные id с весом SIMILAR_RECIPES_TAG_WEIGHT.
+    recipes - queryset рецептов, если нужны не все.
+    """
+    if recipes is None:
+        recipes = Recipe.objects.all()
+        ingredients = RecipeIngredient.objects.all()
+        tags = Recipe.tags.through.objects.all()
+    else:
+        recipes = recipes.values('id').order_by()
+        ingredients = RecipeIngredient.objects.filter(recipe_id__in=recipes)
+        tags = Recipe.tags.through.objects.filter(recipe_id__in=recipes)
+    features = {
+        recipe_id: {}
+        for recipe_id in recipes.values_list('id', flat=True).order_by()
+    }
+    for recipe_id, ingredient_id in ingredients.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator(chunk_size=READ_CHUNK_SIZE):
+        features.setdefault(recipe_id, {})[ingredient_id] = 1.0
+    for recipe_id, tag_id in tags.values_list(
+        'recipe_id', 'tag_id'
+    ).iterator(chunk_size=READ_CHUNK_SIZE):
+        features.setdefault(recipe_id, {})[-tag_id] = (
+            SIMILAR_RECIPES_TAG_WEIGHT
+        )
+    return features
+
+
+def load_frequencies():
+    """
+    Возвращает число рецептов и {признак: число рецептов с ним},
+    посчитанные в базе, - для IDF без загрузки всех признаков.
+    """
+    frequencies = Counter(dict(
+        RecipeIngredient.objects.values_list('ingredient_id').annotate(
+            count=Count('recipe_id', distinct=True)
+        ).order_by()
+    ))
+    frequencies.update({
+        -tag_id: count
+        for tag_id, count in Recipe.tags.through.objects.values_list(
+            'tag_id'
+        ).annotate(count=Count('recipe_id')).order_by()
+    })
+    return Recipe.objects.count(), frequencies
+
+
+def queued_neighbourhood():
+    """
+    Рецепты из очереди на пересчёт и рецепты, у которых есть общий
+    с ними ингредиент (полусоединение в базе). Только среди них
+    у рецептов из очереди могут быть соседи, похожие не одними тегами.
+    """
+    queued = SimilarRecipeQueue.objects.values('recipe_id')
+    shared = RecipeIngredient.objects.filter(
+        ingredient_id__in=RecipeIngredient.objects.filter(
+            recipe_id__in=queued
+        ).values('ingredient_id')
+    ).values('recipe_id')
+    return Recipe.objects.filter(Q(id__in=queued) | Q(id__in=shared))
+
+
+class RecipeVectors:
+    """
+    TF-IDF векторы рецептов единичной длины. Для части рецептов
+    передаются total и frequencies, посчитанные по всем рецептам.
+    """
+    def __init__(self, features, total=None, frequencies=None):
+        self.ids = list(features)
+        self.index = {recipe_id: row for row, recipe_id in enumerate(self.ids)}
+        if frequencies is None:
+            frequencies = Counter(
+                feature for weights in features.values()
+                for feature in weights
+            )
+        if total is None:
+            total = len(self.ids)
+        idf = {
+            feature: math.log((1 + total) / (1 + count)) + 1
+            for feature, count in frequencies.items()
+        }
+        self.vectors = []
+        for weights in features.values():
+            vector = {
+                feature: weight * idf[feature]
+                for feature, weight in weights.items()
+            }
+            norm = math.sqrt(sum(value * value for value in vector.values()))
+            self.vectors.append({
+                feature: value / norm for feature, value in vector.items()
+            } if norm else {})
+
+
+class PythonEngine:
+    """
+    Косинусное сходство на чистом Python через инвертированный индекс:
+    строки обрабатываются блоками, для каждой строки считаются только
+    рецепты с общими признаками.
+    """
+    def __init__(self, vectors, block_size):
+        self.vectors = vectors.vectors
+        self.block_size = block_size
+        self.postings = defaultdict(list)
+        for row, vector in enumerate(self.vectors):
+            for feature, value in vector.items():
+                self.postings[feature].append((row, value))
+
+    def scores(self, rows):
+        """Выдаёт (строка, {другая строка: сходство > 0})."""
+        for block in batched(rows, self.block_size):
+            for row in block:
+                accumulated = defaultdict(float)
+                for feature, value in self.vectors[row].items():
+                    for other, other_value in self.postings[feature]:
+                        accumulated[other] += value * other_value
+                accumulated.pop(row, None)
+                yield row, accumulated
+
+    def top_k(self, rows, k):
+        """Выдаёт (строка, [(другая строка, сходство), ...]) по убыванию."""
+        for row, scores in self.scores(rows):
+            yield row, heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+
+class NumpyEngine:
+    """
+    Косинусное сходство произведением разреженных матриц SciPy:
+    блок строк умножается на всю матрицу сразу.
+    """
+    def __init__(self, vectors, block_size):
+        self.block_size = block_size
+        columns = {}
+        data, indices, indptr = [], [], [0]
+        for vector in vectors.vectors:
+            for feature, value in vector.items():
+                indices.append(columns.setdefault(feature, len(columns)))
+                data.append(value)
+            indptr.append(len(indices))
+        self.matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), indices, indptr),
+            shape=(len(vectors.vectors), len(columns)),
+        )
+        self.transposed = self.matrix.T.tocsc()
+
+    def blocks(self, rows):
+        for block in batched(rows, self.block_size):
+            similarity = (self.matrix[block] @ self.transposed).toarray()
+            similarity[np.arange(len(block)), block] = 0
+            yield block, similarity
+
+    def scores(self, rows):
+        for block, similarity in self.blocks(rows):
+            for row, values in zip(block, similarity):
+                others = np.flatnonzero(values > 0)
+                yield row, dict(zip(others.tolist(),
+                                    values[others].tolist()))
+
+    def top_k(self, rows, k):
+        for block, similarity in self.blocks(rows):
+            count = min(k, similarity.shape[1] - 1)
+            if count <= 0:
+                for row in block:
+                    yield row, []
+                continue
+            best = np.argpartition(-similarity, count - 1, axis=1)[:, :count]
+            for row, values, others in zip(block, similarity, best):
+                yield row, sorted(
+                    ((other, value)
+                     for other, value in zip(others.tolist(),
+                                             values[others].tolist())
+                     if value > 0),
+                    key=itemgetter(1),
+                    reverse=True,
+                )
+
+
+def get_engine(vectors, block_size, engine='auto'):
+    """Выбирает NumPy/SciPy, если они установлены, иначе чистый Python."""
+    if engine == 'numpy' or (engine == 'auto' and np is not None):
+        if np is None:
+            raise ImportError('Для engine=numpy нужны numpy и scipy.')
+        return NumpyEngine(vectors, block_size)
+    return PythonEngine(vectors, block_size)
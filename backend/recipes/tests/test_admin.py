@@ -0,0 +1,91 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.fixtures import create_ingredients, create_recipe, create_user
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+AUTOCOMPLETE_URL = '/admin/autocomplete/'
+USERS = 300
+RECIPES = 300
+INGREDIENTS = 30
+MAX_QUERIES = 25
+MAX_PAGE_SIZE = 150 * 1024
+
+
+class AdminPagesTests(TestCase):
+    """
+    Число SQL-запросов и размер страниц админки не растут с размером
+    таблиц и числом ингредиентов рецепта.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', is_staff=True, is_superuser=True)
+        # bulk_create на SQLite не заполняет первичные ключи.
+        User.objects.bulk_create(
+            User(username=f'user{number}', email=f'user{number}@example.com')
+            for number in range(USERS)
+        )
+        users = list(User.objects.exclude(pk=cls.admin.pk).order_by('pk'))
+        Recipe.objects.bulk_create(
+            Recipe(author=users[number], name=f'Рецепт {number}',
+                   text='Текст', cooking_time=10,
+                   image='recipes/images/test.png',
+                   short_url=f'admin{number}')
+            for number in range(RECIPES)
+        )
+        recipes = list(Recipe.objects.order_by('pk'))
+        cls.recipe = create_recipe(
+            cls.admin, 'Борщ',
+            ingredients=create_ingredients(
+                *(f'Ингредиент {number}' for number in range(INGREDIENTS))
+            ),
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in users[:30] for recipe in recipes[:30]
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def check_page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries.captured_queries), MAX_QUERIES)
+        self.assertLessEqual(len(response.content), MAX_PAGE_SIZE)
+
+    def test_recipe_pages(self):
+        self.check_page('/admin/recipes/recipe/')
+        self.check_page('/admin/recipes/recipe/add/')
+        self.check_page(f'/admin/recipes/recipe/{self.recipe.pk}/change/')
+
+    def test_favorite_and_shopping_cart_pages(self):
+        for model in (Favorite, ShoppingCart):
+            with self.subTest(model=model.__name__):
+                url = f'/admin/recipes/{model._meta.model_name}/'
+                self.check_page(url)
+                self.check_page(
+                    f'{url}{model.objects.order_by("pk").last().pk}/change/'
+                )
+
+    def test_autocomplete_skips_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(AUTOCOMPLETE_URL, {
+                'term': 'Бор',
+                'app_label': 'recipes',
+                'model_name': 'favorite',
+                'field_name': 'recipe',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['text'] for result in
+                          response.json()['results']], ['Борщ'])
+        recipe_queries = [query['sql'] for query in queries.captured_queries
+                          if 'FROM "recipes_recipe"' in query['sql']]
+        self.assertTrue(recipe_queries)
+        for sql in recipe_queries:
+            self.assertNotIn('recipes_favorite', sql)
+            self.assertNotIn('recipes_recipeclick', sql)
@@ -0,0 +1,68 @@
+import base64
+import io
+import json
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.tests.fixtures import create_user
+from recipes.models import Recipe
+
+CREATED_AT = datetime(2020, 5, 1, 12, 30, tzinfo=timezone.utc)
+IMAGE = {'name': 'recipes/images/soup.png',
+         'data': base64.b64encode(b'same image').decode()}
+
+
+class ImportRecipesTests(TestCase):
+    def setUp(self):
+        create_user('author')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'recipes.jsonl'
+        self.path.write_text('\n'.join(
+            json.dumps({
+                'name': f'Суп {number}',
+                'text': 'Сварить.',
+                'cooking_time': 30,
+                'image': IMAGE,
+                'author': 'author',
+                'short_url': f'soup{number}',
+                'created_at': CREATED_AT.isoformat(),
+                'ingredients': [{'name': 'Соль', 'measurement_unit': 'г',
+                                 'amount': 5}],
+                'tags': [{'slug': 'lunch', 'name': 'Обед'}],
+            })
+            for number in range(3)
+        ), encoding='utf-8')
+
+    def import_recipes(self):
+        media = Path(self.directory.name) / 'media'
+        with override_settings(MEDIA_ROOT=media):
+            call_command('import_recipes', str(self.path),
+                         stdout=io.StringIO())
+        return media
+
+    def test_created_at_kept_without_touching_model_field(self):
+        self.import_recipes()
+        self.assertEqual(
+            set(Recipe.objects.values_list('created_at', flat=True)),
+            {CREATED_AT},
+        )
+        self.assertTrue(Recipe._meta.get_field('created_at').auto_now_add)
+        recipe = Recipe.objects.create(
+            author=Recipe.objects.first().author, name='Новый', text='-',
+            cooking_time=1, image='recipes/images/new.png'
+        )
+        self.assertNotEqual(recipe.created_at, CREATED_AT)
+
+    def test_identical_inline_images_saved_once(self):
+        media = self.import_recipes()
+        self.assertEqual(
+            len(set(Recipe.objects.values_list('image', flat=True))), 1
+        )
+        self.assertEqual(
+            len(list((media / 'recipes' / 'images').iterdir())), 1
+        )
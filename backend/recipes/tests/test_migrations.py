@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+CREATED_AT = datetime(2020, 5, 1, 12, 30, tzinfo=timezone.utc)
+BEFORE = [('recipes', '0010_recipe_name_index')]
+AFTER = [('recipes', '0011_popularity')]
+
+
+class BackfillCreatedAtTests(TransactionTestCase):
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_rows_get_recipe_created_at(self):
+        apps = self.migrate(BEFORE)
+        user = apps.get_model('users', 'User').objects.create(
+            username='author', email='author@example.com'
+        )
+        Recipe = apps.get_model('recipes', 'Recipe')
+        recipe = Recipe.objects.create(
+            author=user, name='Суп', text='Сварить.', cooking_time=10,
+            image='recipes/images/soup.png', short_url='soup'
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(created_at=CREATED_AT)
+        for name in ('Favorite', 'ShoppingCart'):
+            apps.get_model('recipes', name).objects.create(
+                user=user, recipe=recipe
+            )
+        apps = self.migrate(AFTER)
+        for name in ('Favorite', 'ShoppingCart'):
+            self.assertEqual(
+                list(apps.get_model('recipes', name).objects.values_list(
+                    'created_at', flat=True
+                )),
+                [CREATED_AT]
+            )
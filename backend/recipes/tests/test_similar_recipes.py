@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.tests.fixtures import (create_ingredients, create_recipe,
+                                create_tags, create_user)
+from recipes.models import RecipeIngredient, SimilarRecipe
+from recipes.similarity import (RecipeVectors, load_features,
+                                load_frequencies, queued_neighbourhood)
+
+
+class IncrementalSimilarRecipesTests(TestCase):
+    def setUp(self):
+        author = create_user('author')
+        salt, flour, milk, egg, fish = create_ingredients(
+            'Соль', 'Мука', 'Молоко', 'Яйцо', 'Рыба'
+        )
+        self.milk = milk
+        lunch, dinner = create_tags('lunch', 'dinner')
+        self.bread = create_recipe(author, 'Хлеб', [lunch], [salt, flour])
+        self.pancakes = create_recipe(author, 'Блины', [dinner],
+                                      [flour, egg])
+        self.porridge = create_recipe(author, 'Каша', [lunch],
+                                      [salt, milk])
+        self.omelette = create_recipe(author, 'Омлет', [lunch], [egg])
+        self.fish = create_recipe(author, 'Рыба', [lunch], [fish])
+        self.build()
+        RecipeIngredient.objects.create(recipe=self.bread,
+                                        ingredient=self.milk, amount=10)
+        self.bread.save()
+
+    @staticmethod
+    def build(*args):
+        call_command('build_similar_recipes', '--engine', 'python', *args,
+                     stdout=StringIO())
+        return sorted(SimilarRecipe.objects.values_list(
+            'recipe_id', 'similar_id', 'score'
+        ))
+
+    def test_loads_only_recipes_sharing_ingredients(self):
+        with self.assertNumQueries(3):
+            features = load_features(queued_neighbourhood())
+        self.assertEqual(
+            set(features),
+            {self.bread.id, self.pancakes.id, self.porridge.id}
+        )
+
+    def test_vectors_match_full_load(self):
+        full = RecipeVectors(load_features())
+        part = RecipeVectors(load_features(queued_neighbourhood()),
+                             *load_frequencies())
+        for recipe_id, row in part.index.items():
+            vector = full.vectors[full.index[recipe_id]]
+            for feature, value in part.vectors[row].items():
+                self.assertAlmostEqual(value, vector[feature])
+
+    def test_incremental_matches_rebuild(self):
+        incremental = [
+            row for row in self.build('--incremental')
+            if self.bread.id in row[:2]
+        ]
+        rebuilt = [
+            row for row in self.build()
+            if self.bread.id in row[:2]
+        ]
+        self.assertTrue(incremental)
+        # Соседи только по тегам (Омлет, Рыба) при инкрементальном
+        # пересчёте не рассматриваются.
+        self.assertEqual(
+            incremental,
+            [row for row in rebuilt
+             if not {self.omelette.id, self.fish.id} & set(row[:2])]
+        )
@@ -1,19 +1,20 @@
-from django.shortcuts import get_object_or_404
-from django.views.generic import RedirectView
-from django.views.generic.detail import SingleObjectMixin
+from django.http import Http404, HttpResponseRedirect
+from django.views import View
 
+from foodgram_backend.async_views import AsyncViewMixin
+from recipes.clicks import click_counter
 from recipes.models import Recipe
 
 
-class ShortUrlRedirectView(SingleObjectMixin, RedirectView):
+class ShortUrlRedirectView(AsyncViewMixin, View):
     """
     Представление для переадресации пользователя, используя короткую ссылку.
     """
-    queryset = Recipe.objects.all()
-
-    def get_object(self, queryset=None):
-        return get_object_or_404(Recipe, short_url=self.kwargs['short_url'])
-
-    def get_redirect_url(self, *args, **kwargs):
-        recipe = self.get_object()
-        return f'/recipes/{recipe.id}/'
+    def get(self, request, short_url):
+        recipe_id = Recipe.objects.filter(short_url=short_url).values_list(
+            'id', flat=True
+        ).first()
+        if recipe_id is None:
+            raise Http404('Рецепт не найден.')
+        click_counter.hit(recipe_id)
+        return HttpResponseRedirect(f'/recipes/{recipe_id}/')
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.contrib.auth.models import Group
 
+from foodgram_backend.admin import LargeTableAdmin
 from users.models import Follow
 
 User = get_user_model()
@@ -23,11 +24,18 @@ class UserAdmin(DjangoUserAdmin):
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
+    list_display = (
+        'user',
+        'following'
+    )
     search_fields = (
         'user__username',
         'following__username'
     )
+    list_select_related = ('user', 'following')
+    autocomplete_fields = ('user', 'following')
+    ordering = ('-id',)
 
 
 admin.site.unregister(Group)
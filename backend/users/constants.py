@@ -5,3 +5,7 @@ MAX_LAST_NAME_LENGTH = 150
 MAX_PASSWORD_LENGTH = 128
 MAX_USERNAME_LENGTH = 150
 MIN_PASSWORD_LENGTH = 8
+
+# Константы рекомендаций авторов
+AUTHOR_SUGGESTIONS_COUNT = 10
+AUTHOR_SUGGESTIONS_NEIGHBOURS = 100
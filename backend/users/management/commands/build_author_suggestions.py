@@ -0,0 +1,96 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.bulk import batched, insert_rows
+from users.constants import AUTHOR_SUGGESTIONS_COUNT
+from users.models import AuthorSuggestion, AuthorSuggestionQueue
+from users.suggestions import FollowGraph, np
+
+SCORE_DIGITS = 4
+
+
+class Command(BaseCommand):
+    """
+    Класс, реализующий расчёт рекомендаций авторов по графу
+    совместных подписок.
+    """
+    help = ('Пересчитывает рекомендации авторов для всех пользователей '
+            'или, с --incremental, для пользователей из очереди (изменивших '
+            'подписки) и подписчиков тех же авторов. Отбор ближайших '
+            'авторов в --incremental не пересчитывается для остальных, '
+            'поэтому полный пересчёт стоит запускать периодически.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true')
+        parser.add_argument('--top-k', type=int,
+                            default=AUTHOR_SUGGESTIONS_COUNT)
+        parser.add_argument('--block-size', type=int, default=256)
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Для расчёта рекомендаций нужны numpy '
+                               'и scipy.')
+        started = time.perf_counter()
+        # Пользователи, попавшие в очередь во время расчёта, останутся в ней.
+        queued = list(AuthorSuggestionQueue.objects.values_list(
+            'user_id', flat=True
+        ))
+        if options['incremental'] and not queued:
+            self.stdout.write('Очередь на пересчёт пуста.')
+            return
+        graph = FollowGraph()
+        if options['incremental']:
+            count = self.update(graph, queued, options['top_k'],
+                                options['block_size'])
+        else:
+            count = self.rebuild(graph, queued, options['top_k'],
+                                 options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {count} '
+            f'({time.perf_counter() - started:.1f} с).'
+        ))
+
+    @staticmethod
+    def get_rows(suggestions):
+        return [
+            (user_id, author_id, round(score, SCORE_DIGITS))
+            for user_id, authors in suggestions
+            for author_id, score in authors
+        ]
+
+    def rebuild(self, graph, queued, top_k, block_size):
+        rows = self.get_rows(
+            graph.top_k(range(len(graph.ids)), top_k, block_size)
+        )
+        with transaction.atomic():
+            AuthorSuggestion.objects.all().delete()
+            insert_rows(AuthorSuggestion, ('user_id', 'author_id', 'score'),
+                        rows)
+            for ids in batched(queued, 500):
+                AuthorSuggestionQueue.objects.filter(user_id__in=ids).delete()
+        return len(graph.ids)
+
+    def update(self, graph, queued, top_k, block_size):
+        """
+        Пересчитывает рекомендации пользователей из очереди и тех, кто
+        подписан на тех же авторов; оставшиеся без подписок пользователи
+        теряют рекомендации. Возвращает число пересчитанных пользователей.
+        """
+        affected = graph.affected_rows(queued)
+        for block in batched(affected, block_size):
+            rows = self.get_rows(graph.top_k(block, top_k, block_size))
+            with transaction.atomic():
+                AuthorSuggestion.objects.filter(
+                    user_id__in=graph.ids[block].tolist()
+                ).delete()
+                insert_rows(AuthorSuggestion,
+                            ('user_id', 'author_id', 'score'), rows)
+        for ids in batched(queued, 500):
+            with transaction.atomic():
+                AuthorSuggestion.objects.filter(user_id__in=ids).exclude(
+                    user_id__in=graph.ids[graph.rows(ids)].tolist()
+                ).delete()
+                AuthorSuggestionQueue.objects.filter(user_id__in=ids).delete()
+        return len(affected)
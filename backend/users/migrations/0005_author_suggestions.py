@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20241114_1211'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorSuggestionQueue',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID пользователя')),
+            ],
+            options={
+                'verbose_name': 'пользователь для пересчёта рекомендаций',
+                'verbose_name_plural': 'Пользователи для пересчёта рекомендаций',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggested_to', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_suggestions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'рекомендованный автор',
+                'verbose_name_plural': 'Рекомендованные авторы',
+                'ordering': ('user', '-score'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='authorsuggestion',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_user_suggested_author'),
+        ),
+    ]
@@ -83,3 +83,53 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} - {self.following}'
+
+
+class AuthorSuggestion(models.Model):
+    """
+    Рекомендованный пользователю автор: на него подписаны те, кто
+    подписан на тех же авторов (см. команду build_author_suggestions).
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='author_suggestions',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='suggested_to',
+        on_delete=models.CASCADE,
+        verbose_name='Автор'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_user_suggested_author'
+            )
+        ]
+        verbose_name = 'рекомендованный автор'
+        verbose_name_plural = 'Рекомендованные авторы'
+        ordering = ('user', '-score')
+
+    def __str__(self):
+        return f'{self.user} - {self.author}'
+
+
+class AuthorSuggestionQueue(models.Model):
+    """
+    Пользователи и авторы, подписки которых изменились: пересчитываются
+    рекомендации их самих и всех, кто подписан на тех же авторов. Без
+    внешнего ключа: запись может появиться при удалении пользователя.
+    """
+    user_id = models.BigIntegerField('ID пользователя', primary_key=True)
+
+    class Meta:
+        verbose_name = 'пользователь для пересчёта рекомендаций'
+        verbose_name_plural = 'Пользователи для пересчёта рекомендаций'
+
+    def __str__(self):
+        return str(self.user_id)
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import AuthorSuggestion, AuthorSuggestionQueue, Follow
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def queue_author_suggestions(sender, instance, created=False, **kwargs):
+    """
+    Ставит пользователя и автора в очередь на пересчёт рекомендаций,
+    а автора, на которого пользователь подписался, сразу убирает из них.
+    """
+    AuthorSuggestionQueue.objects.bulk_create(
+        [AuthorSuggestionQueue(user_id=instance.user_id),
+         AuthorSuggestionQueue(user_id=instance.following_id)],
+        ignore_conflicts=True,
+    )
+    if created:
+        AuthorSuggestion.objects.filter(
+            user_id=instance.user_id, author_id=instance.following_id
+        ).delete()
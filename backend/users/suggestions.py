@@ -0,0 +1,113 @@
+from array import array
+
+from recipes.bulk import batched
+from users.constants import AUTHOR_SUGGESTIONS_NEIGHBOURS
+from users.models import Follow
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+READ_CHUNK_SIZE = 10000
+
+
+class FollowGraph:
+    """
+    Граф подписок в виде разреженной матрицы пользователь × автор.
+
+    Оценка автора Y для пользователя - сумма косинусных мер
+    совместных подписок "подписанные на X подписаны и на Y" по всем
+    авторам X, на которых пользователь подписан. Для каждого X
+    учитываются только AUTHOR_SUGGESTIONS_NEIGHBOURS самых близких Y.
+    """
+    def __init__(self):
+        users, authors = array('q'), array('q')
+        for user_id, author_id in Follow.objects.order_by().values_list(
+            'user_id', 'following_id'
+        ).iterator(chunk_size=READ_CHUNK_SIZE):
+            users.append(user_id)
+            authors.append(author_id)
+        users = np.frombuffer(users, dtype=np.int64)
+        authors = np.frombuffer(authors, dtype=np.int64)
+        self.ids = np.unique(np.concatenate((users, authors)))
+        size = len(self.ids)
+        self.follows = sparse.csr_matrix(
+            (np.ones(len(users), dtype=np.float32),
+             (np.searchsorted(self.ids, users),
+              np.searchsorted(self.ids, authors))),
+            shape=(size, size),
+        )
+        followers = np.asarray(self.follows.sum(axis=0)).ravel()
+        co_follows = self.follows.T @ self.follows
+        co_follows = co_follows - sparse.diags(co_follows.diagonal())
+        co_follows.eliminate_zeros()
+        scale = sparse.diags(1 / np.sqrt(np.maximum(followers, 1)))
+        self.co_follows = self.keep_largest(
+            (scale @ co_follows @ scale).tocsr(),
+            AUTHOR_SUGGESTIONS_NEIGHBOURS,
+        )
+
+    @staticmethod
+    def keep_largest(matrix, count):
+        """
+        Оставляет в каждой строке не больше count наибольших значений:
+        у популярных авторов тысячи совместных подписок, а на оценку
+        влияют в основном самые частые.
+        """
+        lengths = np.diff(matrix.indptr)
+        for row in np.flatnonzero(lengths > count).tolist():
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            extra = end - start - count
+            matrix.data[start + np.argpartition(
+                matrix.data[start:end], extra
+            )[:extra]] = 0
+        matrix.eliminate_zeros()
+        return matrix
+
+    def rows(self, user_ids):
+        """Номера строк пользователей, которые есть в графе."""
+        user_ids = np.asarray(list(user_ids), dtype=np.int64)
+        rows = np.searchsorted(self.ids, user_ids)
+        found = rows < len(self.ids)
+        found[found] = self.ids[rows[found]] == user_ids[found]
+        return rows[found].tolist()
+
+    def affected_rows(self, user_ids):
+        """
+        Строки пользователей, оценки которых могли измениться после
+        изменения подписок user_ids: сами user_ids и подписчики авторов,
+        на которых они подписаны или которыми являются.
+        """
+        rows = self.rows(user_ids)
+        authors = np.union1d(rows, self.follows[rows].indices)
+        followers = self.follows.tocsc()[:, authors].indices
+        return np.union1d(rows, followers).tolist()
+
+    def top_k(self, rows, k, block_size):
+        """
+        Выдаёт (id пользователя, [(id автора, оценка), ...]) по убыванию
+        оценки без авторов, на которых он уже подписан, и его самого.
+        """
+        for block in batched(rows, block_size):
+            follows = self.follows[block]
+            scores = follows @ self.co_follows
+            for index, row in enumerate(block):
+                start, end = scores.indptr[index], scores.indptr[index + 1]
+                authors = scores.indices[start:end]
+                values = scores.data[start:end]
+                followed = follows.indices[
+                    follows.indptr[index]:follows.indptr[index + 1]
+                ]
+                keep = ((values > 0) & (authors != row)
+                        & ~np.isin(authors, followed))
+                authors, values = authors[keep], values[keep]
+                if len(values) > k:
+                    best = np.argpartition(values, -k)[-k:]
+                    authors, values = authors[best], values[best]
+                order = np.argsort(-values, kind='stable')
+                yield int(self.ids[row]), list(zip(
+                    self.ids[authors[order]].tolist(),
+                    values[order].tolist(),
+                ))